@@ -0,0 +1,12 @@
+import time
+from typing import Any, Callable
+
+
+def bench(label: str, fn: Callable[[], Any], rows: int, repeat: int) -> None:
+    """Runs fn once to warm up, then `repeat` times, and prints the throughput in rows per second."""
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {rows * repeat / elapsed:>14,.0f} rows/s")
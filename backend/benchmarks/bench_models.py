@@ -0,0 +1,149 @@
+"""
+Measures validation and serialization throughput of the LMS models and of the ObjectId type.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_models --rows 1000 --repeat 20
+"""
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, List
+from bson import ObjectId
+from pydantic import TypeAdapter
+from pydantic_core import core_schema
+from benchmarks._util import bench
+from models.assignment import Assignment, StudentCompletion, Teacher
+from models.common import PyObjectId
+from models.course import CourseModel
+from models.materials import MaterialModel
+
+
+class LegacyObjectId(ObjectId):
+    # The previous schema: a union tried in order, ObjectId.is_valid then a second parse
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source_type: Any, handler) -> core_schema.CoreSchema:
+        return core_schema.union_schema([
+            core_schema.is_instance_schema(ObjectId),
+            core_schema.chain_schema([
+                core_schema.str_schema(),
+                core_schema.no_info_plain_validator_function(cls.validate),
+            ]),
+        ])
+
+    @classmethod
+    def validate(cls, value: Any) -> ObjectId:
+        if not ObjectId.is_valid(value):
+            raise ValueError("Invalid ObjectId")
+        return ObjectId(value)
+
+
+def teacher() -> dict:
+    return {"_id": ObjectId(), "name": "teacher", "role": "teacher"}
+
+
+def make_teachers(n: int) -> List[dict]:
+    return [teacher() for _ in range(n)]
+
+
+def make_completions(n: int) -> List[dict]:
+    return [{"_id": ObjectId(), "student_name": f"student{i}", "completed_at": datetime(2024, 1, 1)} for i in range(n)]
+
+
+def make_assignments(n: int) -> List[dict]:
+    course_id = ObjectId()
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Assignment {i}",
+            "description": "Read chapter and answer the questions.",
+            "deadline": datetime(2024, 1, 1) + timedelta(days=i),
+            "teacher": teacher(),
+            "students_completed": make_completions(5),
+            "course_id": course_id,
+        }
+        for i in range(n)
+    ]
+
+
+def make_courses(n: int) -> List[dict]:
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Course {i}",
+            "description": "An introductory course.",
+            "owner": teacher(),
+            "teachers": make_teachers(2),
+            "students": [{"_id": str(ObjectId()), "name": f"student{j}"} for j in range(10)],
+            "assignments": [],
+            "archived": False,
+            "created_at": datetime(2024, 1, 1),
+        }
+        for i in range(n)
+    ]
+
+
+def make_materials(n: int) -> List[dict]:
+    course_id = ObjectId()
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Material {i}",
+            "file_url": f"materials/{course_id}/file{i}.pdf",
+            "storage_backend": "local",
+            "storage_key": f"{course_id}/file{i}.pdf",
+            "file_type": "application/pdf",
+            "file_size": 1024,
+            "course_id": course_id,
+            "uploaded_at": datetime(2024, 1, 1),
+        }
+        for i in range(n)
+    ]
+
+
+def bench_object_ids(rows: int, repeat: int) -> None:
+    ids = [ObjectId() for _ in range(rows)]
+    strings = [str(oid) for oid in ids]
+    json_strings = ("[" + ",".join(f'"{s}"' for s in strings) + "]").encode()
+    for name, oid_type in (("legacy", LegacyObjectId), ("current", PyObjectId)):
+        adapter = TypeAdapter(List[oid_type])
+        print(f"ObjectId type: {name}")
+        bench("validate ObjectId", lambda: adapter.validate_python(ids), rows, repeat)
+        bench("validate str", lambda: adapter.validate_python(strings), rows, repeat)
+        # The legacy schema can neither validate JSON input (its isinstance branch) nor dump JSON without json_encoders
+        if oid_type is PyObjectId:
+            bench("validate JSON", lambda: adapter.validate_json(json_strings), rows, repeat)
+            bench("dump JSON", lambda: adapter.dump_json(ids), rows, repeat)
+        print()
+
+
+def bench_model(model, docs: List[dict], rows: int, repeat: int) -> None:
+    adapter = TypeAdapter(List[model])
+    validated = adapter.validate_python(docs)
+    body = adapter.dump_json(validated, by_alias=True)
+    print(f"{model.__name__} ({rows} rows)")
+    bench("validate documents", lambda: adapter.validate_python(docs), rows, repeat)
+    bench("validate JSON", lambda: adapter.validate_json(body), rows, repeat)
+    bench("dump python", lambda: adapter.dump_python(validated, by_alias=True), rows, repeat)
+    bench("dump JSON", lambda: adapter.dump_json(validated, by_alias=True), rows, repeat)
+    print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    bench_object_ids(args.rows, args.repeat)
+    for model, make in (
+        (Teacher, make_teachers),
+        (StudentCompletion, make_completions),
+        (Assignment, make_assignments),
+        (CourseModel, make_courses),
+        (MaterialModel, make_materials),
+    ):
+        bench_model(model, make(args.rows), args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compares list-endpoint serialization throughput before and after the orjson fast path.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_serialization --rows 1000 --repeat 20
+"""
+import argparse
+import json
+from datetime import datetime, timedelta
+from typing import List
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from benchmarks._util import bench
+from models.assignment import Assignment
+from models.user import UserOut
+from utils.serialization import dumps
+
+
+def make_assignments(n: int) -> List[dict]:
+    course_id = ObjectId()
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Assignment {i}",
+            "description": "Read chapter and answer the questions.",
+            "deadline": datetime(2024, 1, 1) + timedelta(days=i),
+            "teacher": {"_id": ObjectId(), "name": "teacher", "role": "teacher"},
+            "students_completed": [],
+            "course_id": course_id,
+        }
+        for i in range(n)
+    ]
+
+
+def make_users(n: int) -> List[dict]:
+    return [
+        {
+            "id": str(ObjectId()),
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "first_name": "First",
+            "last_name": "Last",
+            "role": "student",
+            "is_active": True,
+        }
+        for i in range(n)
+    ]
+
+
+def legacy_path(model, rows: List[dict], response_adapter: TypeAdapter) -> bytes:
+    # Model per document, then FastAPI re-validates through response_model and json.dumps the result
+    models = [model(**row) for row in rows]
+    validated = response_adapter.validate_python([m.model_dump(by_alias=True) for m in models])
+    return json.dumps(jsonable_encoder(validated), separators=(",", ":")).encode()
+
+
+def adapter_path(rows: List[dict], adapter: TypeAdapter) -> bytes:
+    # Validated once as a list, serialized by pydantic-core
+    return adapter.dump_json(adapter.validate_python(rows), by_alias=True)
+
+
+def trusted_path(rows: List[dict]) -> bytes:
+    # Projected documents straight to orjson
+    return dumps(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    assignments = make_assignments(args.rows)
+    assignment_list = TypeAdapter(List[Assignment])
+    print(f"Assignments ({args.rows} rows)")
+    bench("legacy (model per doc)", lambda: legacy_path(Assignment, assignments, assignment_list), args.rows, args.repeat)
+    bench("TypeAdapter once", lambda: adapter_path(assignments, assignment_list), args.rows, args.repeat)
+    bench("trusted orjson", lambda: trusted_path(assignments), args.rows, args.repeat)
+
+    users = make_users(args.rows)
+    user_list = TypeAdapter(List[UserOut])
+    print(f"\nUsers ({args.rows} rows)")
+    bench("legacy (model per doc)", lambda: legacy_path(UserOut, users, user_list), args.rows, args.repeat)
+    bench("TypeAdapter once", lambda: adapter_path(users, user_list), args.rows, args.repeat)
+    bench("trusted orjson", lambda: trusted_path(users), args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
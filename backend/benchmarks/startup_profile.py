@@ -0,0 +1,51 @@
+"""
+Reports where cold-start import time goes, using the interpreter's -X importtime output.
+
+Run from the backend directory:
+
+    python -m benchmarks.startup_profile --top 25
+    python -m benchmarks.startup_profile --module routers.exports
+"""
+import argparse
+import subprocess
+import sys
+from typing import List, Tuple
+
+
+def profile_imports(module: str) -> List[Tuple[int, int, str]]:
+    """Imports `module` in a fresh interpreter and returns (self_us, cumulative_us, name) rows."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr.splitlines()[-1] if result.stderr else "import failed")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="module to import (default: main)")
+    parser.add_argument("--top", type=int, default=20, help="number of imports to list")
+    args = parser.parse_args()
+
+    rows = profile_imports(args.module)
+    # Top-level imports are the ones without leading indentation in the name column
+    total_us = sum(cumulative for _, cumulative, name in rows if not name.startswith("  "))
+
+    print(f"Total import time for {args.module}: {total_us / 1000:.1f} ms ({len(rows)} modules)\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name.strip()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,6 @@
 from pydantic_settings import BaseSettings
 import secrets
-from dotenv import load_dotenv
-from typing import ClassVar, Dict
-
-
-# Load environment variables from .env
-load_dotenv()
+from typing import ClassVar, Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -15,11 +10,176 @@ class Settings(BaseSettings):
     DB_NAME: str 
     ALGORITHM: str
     BASE_URL: str
+
+    # MongoDB connection pool (one client per worker process)
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 0
+
+    # Production Server Settings (see server.py)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: Optional[int] = None  # Defaults to the number of CPUs
+    SERVER_KEEPALIVE: int = 5  # Seconds an idle keep-alive connection is held open
+    SERVER_BACKLOG: int = 2048  # Pending connections the listening socket queues
+    SERVER_GRACEFUL_TIMEOUT: int = 30  # Seconds in-flight requests get to finish on shutdown
+    SERVER_USE_GUNICORN: bool = False
+
+    # Optional routers to mount; routers left out are never imported
+    ENABLED_ROUTERS: List[str] = ["email", "notifications", "exports", "metrics"]
     
 
+    # Request Deadline Settings (applied to every database call as maxTimeMS; exceeded requests get GEN_504)
+    REQUEST_TIMEOUT: float = 10  # Default budget per request in seconds; 0 disables the deadline
+    ROUTE_TIMEOUTS: Dict[str, float] = {  # Per-route budgets, keyed by endpoint function name
+        "login_for_access_token": 5,
+        "get_users": 5,
+        "list_all_courses": 5,
+        "search_course_catalogue": 5,
+        "clone_single_course": 60,
+        # Request bodies streamed to storage; bounded by the upload limits instead
+        "upload_material": 0,
+        "upload_chunk": 0,
+        "complete_upload": 0,
+        "update_user_profile": 0,  # Profile picture upload
+        # Only queue a course job (which runs unbounded in the background) after updating the course
+        "archive_course": 30,
+        "delete_course": 30,
+        "clone_courses_batch": 30,
+        # Send mail through SMTP while the request waits
+        "send_email": 30,
+        "create_notification_endpoint": 30,
+        # Streamed responses: the budget covers the handler, not the body sent after it
+        "export_users": 30,
+        "export_enrollments": 30,
+        "export_completions": 30,
+        "download_course_materials": 30,
+    }
+
+    # Admission Control Settings (per-worker concurrency limits per route class, adapted with AIMD)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LIMITS: Dict[str, Dict[str, float]] = {
+        # initial/min/max concurrent requests; latency (seconds) above which the limit is cut
+        "auth": {"initial": 16, "min": 2, "max": 64, "target_latency": 1.0},
+        "reads": {"initial": 64, "min": 8, "max": 512, "target_latency": 0.5},
+        "writes": {"initial": 32, "min": 4, "max": 256, "target_latency": 1.0},
+        "uploads": {"initial": 8, "min": 1, "max": 32, "target_latency": 30.0},
+    }
+    ADMISSION_BACKOFF: float = 0.9  # Multiplicative decrease applied on a slow or overloaded response
+
+    # Response Compression Settings (/api responses; brotli and zstd need the brotli/zstandard packages)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # Smaller bodies are sent uncompressed
+    COMPRESSION_LEVELS: Dict[str, int] = {"gzip": 6, "br": 4, "zstd": 3}
+    COMPRESSION_THREAD_THRESHOLD: int = 128 * 1024  # Bodies (or streamed chunks) this large are compressed in a thread
+
     # Token Expiry Settings
-    ACCESS_TOKEN_EXPIRY: int = 3600  # Default to 1 hour (in seconds)
-    REFRESH_TOKEN_EXPIRY: int = 86400  # Default to 24 hours (in seconds)
+    # Units match the variables in existing .env files: minutes for access tokens, days for refresh tokens
+    ACCESS_TOKEN_EXPIRY: int = 60  # Default to 1 hour (in minutes)
+    REFRESH_TOKEN_EXPIRY: int = 1  # Default to 1 day (in days)
+
+    # Shared Redis-compatible store (Redis, Valkey, a local stand-in, ...); unset keeps everything in-process
+    REDIS_URL: Optional[str] = None
+
+    # Response Cache Settings
+    CACHE_BACKEND: str = "memory"  # "memory" or "redis"
+    CACHE_TTL: int = 60  # Seconds a cached response stays fresh
+    CACHE_MAX_ENTRIES: int = 1024  # LRU capacity of the in-process cache
+    REPLICA_CACHE_TTL: int = 5  # Seconds a response built from a secondary stays cached
+
+    # Read Scaling Settings (replica sets only; on a standalone server every read goes to it)
+    READ_PREFERENCES: Dict[str, str] = {  # Per-route read preference, keyed by endpoint function name; default primary
+        # primary, primaryPreferred, secondary, secondaryPreferred or nearest
+        "list_all_courses": "secondaryPreferred",
+        "list_assignments": "secondaryPreferred",
+        "list_materials_for_course": "secondaryPreferred",
+        "get_notifications": "secondaryPreferred",
+    }
+    READ_MAX_STALENESS: int = 90  # Secondaries lagging more than this (seconds, at least 90) are not read; -1 for no limit
+    READ_YOUR_WRITES_WINDOW: int = 60  # Seconds a read token from a write keeps later reads causally consistent
+
+    # Serve list endpoints straight from projected Mongo documents without per-document validation
+    TRUSTED_DB_READS: bool = True
+
+    # Rows fetched from the cursor and encoded per chunk by the streaming export endpoints
+    EXPORT_BATCH_SIZE: int = 500
+
+    # Student Dashboard Settings
+    DASHBOARD_DUE_WINDOW_DAYS: int = 14  # Default look-ahead for due assignments
+    DASHBOARD_MAX_ASSIGNMENTS: int = 50
+
+    # Deadline Reminder Scheduler Settings
+    SCHEDULER_ENABLED: bool = True
+    REMINDER_WINDOWS_HOURS: List[int] = [24, 1]  # Remind students this many hours before a deadline
+    REMINDER_BUCKET_MINUTES: int = 60  # Deadline range covered by each scan query
+    REMINDER_SCAN_INTERVAL: int = 300  # Seconds between scans
+    REMINDER_SEND_EMAILS: bool = True  # Also enqueue reminder emails in the email_outbox collection
+
+    # Email Outbox Settings
+    OUTBOX_POLL_INTERVAL: int = 10  # Seconds between checks for queued emails
+    OUTBOX_SEND_TIMEOUT: int = 120  # Seconds before an email claimed by a worker that stopped is claimed again
+    OUTBOX_MAX_ATTEMPTS: int = 5  # Failed sends before an email is marked failed
+    OUTBOX_RETRY_DELAY: int = 300  # Seconds between attempts
+
+    # Material Storage Settings
+    STORAGE_BACKEND: str = "local"  # Where new uploads go: "local", "s3" or "gridfs"
+    LOCAL_STORAGE_DIR: str = "materials"
+    S3_BUCKET: Optional[str] = None
+    S3_ENDPOINT_URL: Optional[str] = None  # Set for MinIO or other S3-compatible servers
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_MULTIPART_CHUNK_SIZE: int = 8 * 1024 * 1024  # Part size for multipart uploads (S3 minimum is 5 MiB)
+    S3_PRESIGN_EXPIRY: int = 3600  # Seconds a presigned download URL stays valid
+    GRIDFS_BUCKET: str = "material_files"  # GridFS bucket (collection prefix) for the gridfs backend
+
+    # Resumable Upload Settings (chunks are staged in Mongo until the upload is completed)
+    UPLOAD_MAX_SIZE: int = 5 * 1024 * 1024 * 1024  # Largest file a resumable upload accepts
+    UPLOAD_STAGING_CHUNK_SIZE: int = 4 * 1024 * 1024  # Bytes per staged chunk document (well under the 16 MiB BSON limit)
+    UPLOAD_LEASE_SECONDS: int = 60  # A PATCH that stalls this long loses the session to the next one
+    UPLOAD_SESSION_TTL: int = 24 * 3600  # Seconds of inactivity before an upload is abandoned
+    UPLOAD_GC_INTERVAL: int = 3600  # Seconds between sweeps for abandoned uploads
+
+    # Archived Material Reclamation Settings
+    MATERIAL_RETENTION_DAYS: int = 30  # Archived materials can be restored until their file is reclaimed
+    RECLAIM_INTERVAL: int = 3600  # Seconds between sweeps
+    RECLAIM_BATCH_SIZE: int = 100  # Materials deleted per batch
+
+    # Course Summary Read Model Settings (course_summaries, kept in sync from a change stream)
+    COURSE_SUMMARY_BATCH_SIZE: int = 500  # Courses recomputed per batch
+    COURSE_SUMMARY_LOCK_TTL: int = 30  # Seconds before another worker takes over a dead change stream consumer
+    COURSE_SUMMARY_REBUILD_INTERVAL: int = 300  # Seconds between full rebuilds when change streams are unavailable
+
+    # Username Propagation Settings (rename_jobs, processed in the background after a rename)
+    RENAME_BATCH_SIZE: int = 500  # Documents rewritten per update_many
+    RENAME_POLL_INTERVAL: int = 5  # Seconds between checks for queued jobs
+    RENAME_JOB_TIMEOUT: int = 300  # Seconds without progress before a running job is reclaimed
+
+    # Course Lifecycle Settings (course_jobs: archive, restore and delete cascades)
+    COURSE_JOB_BATCH_SIZE: int = 500  # Documents updated or deleted per batch (and transaction)
+    COURSE_JOB_POLL_INTERVAL: int = 5  # Seconds between checks for queued jobs
+    COURSE_JOB_TIMEOUT: int = 300  # Seconds without progress before a running job is reclaimed
+
+    # Material Text Search Settings (material_text, filled by a background extraction worker)
+    EXTRACTION_WORKERS: int = 1  # Extraction processes per app worker
+    EXTRACTION_MAX_CHARS: int = 100_000  # Characters of document text kept for search
+    EXTRACTION_MAX_FILE_SIZE: int = 100 * 1024 * 1024  # Larger files are searchable by title and description only
+    EXTRACTION_TIMEOUT: int = 600  # Seconds before a claimed extraction is retried by another worker
+    EXTRACTION_POLL_INTERVAL: int = 5  # Seconds between checks for queued materials
+
+    # Rate Limiting Settings (token buckets per route group, keyed by client "ip" or authenticated "user")
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per worker) or "redis" (shared across workers)
+    RATE_LIMITS: Dict[str, Dict[str, str]] = {
+        "login": {"rate": "10/minute", "key": "ip"},
+        "mail": {"rate": "20/hour", "key": "user"},
+        "notifications": {"rate": "60/minute", "key": "user"},
+    }
+
+    # Account Lockout Settings
+    LOGIN_MAX_FAILURES: int = 5  # Failed logins within the window that lock an identifier (merged across workers)
+    LOGIN_FAILURE_WINDOW: int = 900  # Sliding window (in seconds)
+    LOGIN_LOCKOUT_DURATION: int = 900  # How long a locked identifier stays locked (in seconds)
+    LOGIN_FAILURE_PERSIST_INTERVAL: int = 5  # Seconds between syncs with MongoDB (how soon other workers see a lock or unlock)
+    LOGIN_FAILURE_MAX_TRACKED: int = 50000  # Identifiers with recent failures (and, separately, lockouts) kept in memory per worker
     
     # Authentication and Authorization Error Codes
     AUTH_ERRORS: ClassVar[Dict[str, str]] = {
@@ -94,5 +254,5 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
 
-# Access settings via the `Settings` class
-settings = Settings()
\ No newline at end of file
+# Access settings via the `Settings` class (.env is read here, once)
+settings = Settings()
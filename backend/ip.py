@@ -11,9 +11,10 @@ def get_public_ip():
         print(f"Error getting public IP: {e}")
         return None
 
-# Example usage
-public_ip = get_public_ip()
-if public_ip:
-    print(f"Your public IP address is: {public_ip}")
-else:
-    print("Could not retrieve public IP address.")
+# Example usage (only when run as a script, never on import)
+if __name__ == "__main__":
+    public_ip = get_public_ip()
+    if public_ip:
+        print(f"Your public IP address is: {public_ip}")
+    else:
+        print("Could not retrieve public IP address.")
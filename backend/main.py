@@ -1,58 +1,186 @@
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
+import importlib
+import os
 from motor.motor_asyncio import AsyncIOMotorClient
-from routers import auth, users, courses, assignment, materials, email_router, notifications
-from config import settings
+from routers import auth, users, courses, assignment, materials, dashboard
+from config import Settings, settings
+from utils.serialization import ORJSONResponse
+from utils.lockout import login_failures
+from utils.indexes import ensure_indexes
+from utils.cache import get_cache
+from utils.rate_limit import get_buckets
+from utils.deadlines import request_deadline
+from utils.admission import AdmissionMiddleware
+from utils.compression import CompressionMiddleware
+from utils.read_routing import TOKEN_HEADER, record_write
+from utils.scheduler import run_scheduler
+from utils.reclaim import run_reclaimer
+from utils.storage import init_storage
+from utils.course_summaries import run_summary_sync
+from utils.renames import run_rename_worker
+from utils.outbox import run_outbox_worker
+from utils.course_lifecycle import run_course_job_worker
+from utils.uploads import run_upload_gc
+from utils.material_search import run_extraction_worker, shutdown_pool
 
-# Database connection handling
+# Routers that are always served
+CORE_ROUTERS = [
+    (auth, ["auth"]),
+    (users, ["users"]),
+    (courses, ["courses"]),
+    (assignment, ["assignments"]),
+    (materials, ["materials"]),
+    (dashboard, ["dashboard"]),
+]
+
+# Optional routers, imported only when listed in settings.ENABLED_ROUTERS
+OPTIONAL_ROUTERS = {
+    "email": ("routers.email_router", ["email"]),
+    "notifications": ("routers.notifications", ["notifications"]),
+    "exports": ("routers.exports", ["exports"]),
+    "metrics": ("routers.metrics", ["metrics"]),
+}
+
+# Directories served as static files; created in the lifespan rather than at import
+STATIC_DIRS = {
+    "/profile_pictures": ("profile_pictures", "profile_pictures"),
+    "/materials": (materials.UPLOAD_DIR, "study_materials"),
+}
+
+
+# Database connection handling and other startup side effects
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.mongodb_client = AsyncIOMotorClient(settings.MONGODB_URL)
+    for directory, _ in STATIC_DIRS.values():
+        os.makedirs(directory, exist_ok=True)
+
+    # One client (and connection pool) per worker process, shared by all requests
+    app.mongodb_client = AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+    )
     app.mongodb = app.mongodb_client[settings.DB_NAME]
+    app.mongodb_replicas = {}  # The database per non-primary read preference, see utils/read_routing.py
     try:
         await app.mongodb.list_collection_names()
         print("Connected to MongoDB successfully")
     except Exception as e:
         print(f"Failed to connect to MongoDB: {e}")
         raise e
+
+    init_storage(app.mongodb)
+
+    # Warm up before accepting traffic: indexes, cache and rate limit backends, the bcrypt backend
+    await ensure_indexes(app.mongodb)
+    get_cache()
+    get_buckets()
+    await asyncio.to_thread(auth.hash_password, "warm-up")
+
+    # Load active lockouts and keep them in sync with the other workers
+    await login_failures.load(app.mongodb)
+    background_tasks = [asyncio.create_task(login_failures.run_persistence(app.mongodb))]
+
+    # Username propagation after renames; jobs are claimed one worker at a time
+    background_tasks.append(asyncio.create_task(run_rename_worker(app.mongodb)))
+
+    # Queued emails (deadline reminders), claimed one at a time like rename jobs
+    background_tasks.append(asyncio.create_task(run_outbox_worker(app.mongodb)))
+
+    # Course archive/restore/delete cascades, claimed like rename jobs
+    background_tasks.append(asyncio.create_task(run_course_job_worker(app.mongodb)))
+
+    # Text extraction for material search; CPU-bound parsing runs in a process pool
+    background_tasks.append(asyncio.create_task(run_extraction_worker(app.mongodb)))
+
+    # Deadline reminders, archived file reclamation, course summaries and abandoned uploads; every worker runs the loops but only the lock holder works
+    if settings.SCHEDULER_ENABLED:
+        background_tasks.append(asyncio.create_task(run_scheduler(app.mongodb)))
+        background_tasks.append(asyncio.create_task(run_reclaimer(app.mongodb)))
+        background_tasks.append(asyncio.create_task(run_summary_sync(app.mongodb)))
+        background_tasks.append(asyncio.create_task(run_upload_gc(app.mongodb)))
     yield
+    for task in background_tasks:
+        task.cancel()
+    shutdown_pool()
+    await login_failures.flush(app.mongodb)
     app.mongodb_client.close()
 
-# Initialize FastAPI app
-app = FastAPI(lifespan=lifespan)
-
-# CORS middleware setup
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Exact frontend URL
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
 # Middleware to log requests for debugging
-@app.middleware("http")
 async def log_request(request: Request, call_next):
     print(f"Request: {request.method} {request.url}")
     response = await call_next(request)
     return response
 
-# Static files
-app.mount("/profile_pictures", StaticFiles(directory="profile_pictures"), name="profile_pictures")
-app.mount("/materials", StaticFiles(directory="materials"), name="study_materials")
+
+# Middleware giving clients a read token after each write, so their next reads on secondaries include it
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    record_write(request, response)
+    return response
+
+
+# Middleware to attach X-RateLimit-* headers set by the rate_limit dependency
+async def rate_limit_headers(request: Request, call_next):
+    response = await call_next(request)
+    for name, value in getattr(request.state, "rate_limit_headers", {}).items():
+        response.headers.setdefault(name, value)
+    return response
+
+
+def create_app(settings: Settings = settings) -> FastAPI:
+    """Builds the application from already-loaded settings."""
+    # Every route runs under its time budget (see utils/deadlines.py)
+    app = FastAPI(
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+        dependencies=[Depends(request_deadline)],
+    )
+
+    # Compression is the innermost layer, so the middlewares below see the final headers
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(CompressionMiddleware)
+
+    # Admission control sits inside CORS so browsers can read the 503
+    if settings.ADMISSION_ENABLED:
+        app.add_middleware(AdmissionMiddleware)
+
+    # CORS middleware setup
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Exact frontend URL
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[TOKEN_HEADER],
+    )
+    if any(mode != "primary" for mode in settings.READ_PREFERENCES.values()):
+        app.middleware("http")(read_your_writes)
+    app.middleware("http")(log_request)
+    app.middleware("http")(rate_limit_headers)
+
+    # Static files (directories are created in the lifespan)
+    for path, (directory, name) in STATIC_DIRS.items():
+        app.mount(path, StaticFiles(directory=directory, check_dir=False), name=name)
+
+    # Include routers
+    for module, tags in CORE_ROUTERS:
+        app.include_router(module.router, prefix="/api", tags=tags)
+    for name in settings.ENABLED_ROUTERS:
+        module_path, tags = OPTIONAL_ROUTERS[name]
+        app.include_router(importlib.import_module(module_path).router, prefix="/api", tags=tags)
+
+    return app
 
 
-# Include routers
-app.include_router(auth.router, prefix="/api", tags=["auth"])
-app.include_router(users.router, prefix="/api", tags=["users"])
-app.include_router(courses.router, prefix="/api", tags=["courses"])
-app.include_router(assignment.router, prefix="/api", tags=["assignments"])
-app.include_router(materials.router, prefix="/api", tags=["materials"])
-app.include_router(email_router.router, prefix="/api", tags=["email"])
-app.include_router(notifications.router, prefix="/api", tags=["notifications"])
+app = create_app()
 
+# Development server with auto-reload; use server.py in production
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -11,7 +11,6 @@ class Teacher(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
-        json_encoders = {PyObjectId: str}
 
 # Student Schema for completed assignments
 class StudentCompletion(BaseModel):
@@ -21,7 +20,6 @@ class StudentCompletion(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
-        json_encoders = {PyObjectId: str}
 
 # Assignment Model
 class Assignment(BaseModel):
@@ -35,7 +33,6 @@ class Assignment(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
-        json_encoders = {PyObjectId: str}
 
 # Schema for Creating a New Assignment (only necessary fields for creation)
 class AssignmentCreate(BaseModel):
@@ -47,5 +44,4 @@ class AssignmentCreate(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
-        json_encoders = {PyObjectId: str}
 
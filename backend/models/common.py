@@ -1,4 +1,5 @@
 from bson import ObjectId
+from bson.errors import InvalidId
 from pydantic import GetJsonSchemaHandler
 from pydantic_core import core_schema
 from typing import Any
@@ -14,17 +15,20 @@ class PyObjectId(ObjectId):
         cls, source_type: Any, handler: GetJsonSchemaHandler
     ) -> core_schema.CoreSchema:
         """
-        Defines the validation and schema logic for PyObjectId.
+        Defines the validation and serialization logic for PyObjectId.
 
-        This schema ensures that values are either instances of ObjectId or valid ObjectId strings.
+        ObjectId instances (documents read from Mongo) pass an isinstance check without calling
+        into Python; strings are parsed once. In JSON mode the value is dumped as its hex string,
+        so models need no `json_encoders`; in Python mode it stays an ObjectId for Mongo writes.
         """
-        return core_schema.union_schema([
-            core_schema.is_instance_schema(ObjectId),  # Accept actual ObjectId instances
-            core_schema.chain_schema([
-                core_schema.str_schema(),  # Accept strings
-                core_schema.no_info_plain_validator_function(cls.validate),  # Validate the string as ObjectId
-            ]),
-        ])
+        from_str = core_schema.no_info_after_validator_function(cls.validate, core_schema.str_schema())
+        return core_schema.json_or_python_schema(
+            json_schema=from_str,
+            python_schema=core_schema.union_schema(
+                [core_schema.is_instance_schema(ObjectId), from_str], mode="left_to_right"
+            ),
+            serialization=core_schema.to_string_ser_schema(when_used="json"),
+        )
 
     @classmethod
     def validate(cls, value: Any) -> ObjectId:
@@ -40,9 +44,14 @@ class PyObjectId(ObjectId):
         Raises:
             ValueError: If the value is not a valid ObjectId.
         """
-        if not ObjectId.is_valid(value):
-            raise ValueError("Invalid ObjectId")
-        return ObjectId(value)
+        if isinstance(value, ObjectId):
+            return value
+        if isinstance(value, str):
+            try:
+                return ObjectId(value)
+            except InvalidId:
+                pass
+        raise ValueError("Invalid ObjectId")
 
     @classmethod
     def __get_pydantic_json_schema__(
@@ -58,6 +67,4 @@ class PyObjectId(ObjectId):
         Returns:
             dict: The updated JSON schema.
         """
-        json_schema = handler(schema)
-        json_schema.update(type="string")  # Represent ObjectId as a string in JSON
-        return json_schema
+        return {"type": "string", "pattern": "^[0-9a-fA-F]{24}$"}
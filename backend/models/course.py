@@ -11,7 +11,6 @@ class Owner(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
-        json_encoders = {PyObjectId: str}
 
 
 # Assignment Schema
@@ -24,7 +23,6 @@ class Assignment(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
-        json_encoders = {PyObjectId: str}
 
 
 # Main Course Model
@@ -41,7 +39,6 @@ class CourseModel(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
-        json_encoders = {PyObjectId: str}
         populate_by_name = True
 
 
@@ -53,7 +50,6 @@ class CourseCreate(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
-        json_encoders = {PyObjectId: str}
 
 
 # Schema for Archiving or Unarchiving a Course
@@ -62,3 +58,23 @@ class CourseArchiveAction(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
+
+
+# Schema for Cloning a Course into a New Term
+class CourseCloneRequest(BaseModel):
+    name: Optional[str] = None  # Name of the copy; defaults to the source name with " (copy)"
+    deadline_offset_days: int = Field(default=0, ge=-3650, le=3650)  # Shift applied to every assignment deadline
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+# Schema for Cloning Several Courses (e.g. a whole department) in One Background Job
+class CourseBatchCloneRequest(BaseModel):
+    course_ids: Optional[List[PyObjectId]] = Field(default=None, max_length=1000)  # Courses to clone
+    teacher_id: Optional[str] = None  # Or: every live course this user teaches
+    name_suffix: str = " (copy)"  # Appended to each cloned course's name
+    deadline_offset_days: int = Field(default=0, ge=-3650, le=3650)
+
+    class Config:
+        arbitrary_types_allowed = True
@@ -10,11 +10,14 @@ class MaterialModel(BaseModel):
     title: str  # Title of the material
     description: Optional[str] = None  # Optional description
     file_url: str  # URL where the file is stored (can be S3, local server, etc.)
+    storage_backend: str = "local"  # Storage backend holding the file (see utils/storage.py)
+    storage_key: Optional[str] = None  # Object key within the backend (the file _id in GridFS)
     file_type: str  # File type (e.g., pdf, pptx, docx, mp4)
     file_size: int  # Size of the file in bytes
     course_id: PyObjectId  # Reference to the course the material is associated with
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)  # Upload timestamp
+    archived: bool = False  # Archived materials are hidden and their files reclaimed after the retention window
+    archived_at: Optional[datetime] = None  # When the material was archived
 
     class Config:
         arbitrary_types_allowed = True
-        json_encoders = {PyObjectId: str}
@@ -1,6 +1,5 @@
 from pydantic import BaseModel, Field, constr, EmailStr
 from typing import Optional, Annotated
-from .common import PyObjectId
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -34,7 +33,6 @@ class User(UserBase):
     profile_picture: Optional[str] = None
 
     class Config:
-        json_encoders = {PyObjectId: str}
         populate_by_name = True
 
 class UserOut(BaseModel):
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request, status
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import List
 from .auth import get_db, get_current_user
@@ -6,9 +6,16 @@ from models.assignment import  Assignment, AssignmentCreate, StudentCompletion
 from bson import ObjectId
 from datetime import datetime
 from models.common import PyObjectId
+from utils.cache import cached_json, course_tag, invalidate_course
+from utils.serialization import model_projection
+from pydantic import TypeAdapter
+from config import settings
 
 router = APIRouter()
 
+# Built once at import; validating a whole list through one adapter avoids a model construction per document
+AssignmentList = TypeAdapter(List[Assignment])
+ASSIGNMENT_PROJECTION = model_projection(Assignment)
 
 
 # 1. Create an Assignment
@@ -40,6 +47,7 @@ async def create_assignment(
     # Insert the assignment into the database
     result = await db["assignments"].insert_one(assignment)
     assignment["_id"] = result.inserted_id
+    await invalidate_course(assignment_data.course_id)
 
     return Assignment(**assignment)
 
@@ -47,18 +55,34 @@ async def create_assignment(
 @router.get("/courses/{course_id}/assignments", response_model=List[Assignment])
 async def list_assignments(
     course_id: str,
+    request: Request,
     current_user = Depends(get_current_user),  # Ensure the user is authenticated
     db = Depends(get_db)
 ):
-    # Verify if the course exists
-    course = await db["courses"].find_one({"_id": ObjectId(course_id)})
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
-
-    # Retrieve assignments for the course
-    assignments = await db["assignments"].find({"course_id": ObjectId(course_id)}).to_list(length=100)
-    
-    return [Assignment(**assignment) for assignment in assignments]
+    async def build():
+        # Verify if the course exists
+        course = await db["courses"].find_one({"_id": ObjectId(course_id)})
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+
+        # Retrieve assignments for the course
+        assignments = await db["assignments"].find(
+            {"course_id": ObjectId(course_id), "archived": {"$ne": True}}, ASSIGNMENT_PROJECTION
+        ).to_list(length=100)
+
+        # Documents we wrote ourselves are serialized as-is
+        if settings.TRUSTED_DB_READS:
+            return assignments
+        return AssignmentList.dump_python(AssignmentList.validate_python(assignments), mode="json", by_alias=True)
+
+    return await cached_json(
+        request,
+        route="list_assignments",
+        params={"course_id": course_id},
+        role=current_user.role,
+        tags=[course_tag(course_id)],
+        build=build,
+    )
 
 # 3. Get Assignment Details by ID
 @router.get("/assignments/{assignment_id}", response_model=Assignment)
@@ -110,6 +134,7 @@ async def mark_assignment_completed(
         {"_id": ObjectId(assignment_id)},
         {"$push": {"students_completed": completed_data.dict()}}
     )
+    await invalidate_course(assignment["course_id"])
 
     # Return the updated assignment
     updated_assignment = await db["assignments"].find_one({"_id": ObjectId(assignment_id)})
@@ -137,6 +162,9 @@ async def update_assignment(
     
     # Update the assignment in the database
     await db["assignments"].update_one({"_id": ObjectId(assignment_id)}, {"$set": update_data})
+    await invalidate_course(assignment["course_id"])
+    if "course_id" in update_data and str(update_data["course_id"]) != str(assignment["course_id"]):
+        await invalidate_course(update_data["course_id"])
 
     # Return the updated assignment
     updated_assignment = await db["assignments"].find_one({"_id": ObjectId(assignment_id)})
@@ -160,5 +188,6 @@ async def delete_assignment(
 
     # Delete the assignment
     await db["assignments"].delete_one({"_id": ObjectId(assignment_id)})
+    await invalidate_course(assignment["course_id"])
 
     return {"status": "success", "message": "Assignment deleted"}
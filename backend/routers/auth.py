@@ -1,38 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from models.user import UserRegister, UserInDB, Token, UserLogin, UserUpdate, UserOut
-from typing import Optional
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from typing import AsyncIterator, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
-from dotenv import load_dotenv
-import os
+from functools import lru_cache
 from config import settings
-
-# Load environment variables from .env
-load_dotenv()
+from utils.rate_limit import rate_limit
+from utils.lockout import login_failures
+from utils.renames import enqueue_rename
+from utils.read_routing import routed_database
 
 router = APIRouter()
 
-# Password hashing configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing configuration, built on first use to keep passlib out of import time
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-# Dependency: Get DB connection
-async def get_db() -> AsyncIOMotorDatabase:
-    client = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
-    return client[os.getenv("DB_NAME")]
+# Dependency: Get DB connection (the worker's client is created once in the app lifespan);
+# routes in READ_PREFERENCES may get a secondary-reading handle, see utils/read_routing.py
+async def get_db(request: Request) -> AsyncIterator[AsyncIOMotorDatabase]:
+    async with routed_database(request) as db:
+        yield db
 
 
 # Utility functions
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -55,11 +59,25 @@ async def get_user(db: AsyncIOMotorDatabase, identifier: str) -> Optional[UserIn
 
 
 async def authenticate_user(db: AsyncIOMotorDatabase, identifier: str, password: str) -> Optional[UserInDB]:
+    # Reject locked identifiers before any database lookup or bcrypt work
+    locked_for = login_failures.locked_for(identifier)
+    if locked_for is not None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                "error_code": "AUTH_403_ACCOUNT_LOCKED",
+                "message": settings.AUTH_ERRORS["AUTH_403_ACCOUNT_LOCKED"],
+            },
+            headers={"Retry-After": str(locked_for)},
+        )
+
     # Query the database to find the user by username or email
     user = await db["users"].find_one({"$or": [{"username": identifier}, {"email": identifier}]})
     
     # If user is found, verify the password
     if user and verify_password(password, user.get("password")):
+        login_failures.record_success(identifier)
+
         # Check if the user is active
         if not user.get("is_active", False):
             return None  # User is inactive, return None
@@ -71,6 +89,7 @@ async def authenticate_user(db: AsyncIOMotorDatabase, identifier: str, password:
         
         return UserInDB(**user)
     
+    await login_failures.record_failure(db, identifier)
     return None  # Return None if authentication fails
 
 
@@ -115,7 +134,7 @@ async def get_current_user(
 
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit("login"))])
 async def login_for_access_token(login_request: UserLogin, db=Depends(get_db)):
     user = await authenticate_user(db, login_request.identifier, login_request.password)
     
@@ -127,8 +146,8 @@ async def login_for_access_token(login_request: UserLogin, db=Depends(get_db)):
         )
 
     # Generate access and refresh tokens
-    access_token_expires = timedelta(minutes=int(os.getenv("ACCESS_TOKEN_EXPIRY")))
-    refresh_token_expires = timedelta(days=int(os.getenv("REFRESH_TOKEN_EXPIRY")))
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRY)
+    refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRY)
     access_token = create_access_token(
         data={"sub": user.username, "role": user.role}, expires_delta=access_token_expires
     )
@@ -143,7 +162,7 @@ async def login_for_access_token(login_request: UserLogin, db=Depends(get_db)):
         "expires_at": datetime.utcnow() + refresh_token_expires,
     })
     if user.profile_picture:
-        profile_picture = os.getenv("BASE_URL") + user.profile_picture
+        profile_picture = settings.BASE_URL + user.profile_picture
     else:
         profile_picture = "None"
     return {
@@ -187,7 +206,7 @@ async def refresh_access_token(refresh_token: str, db=Depends(get_db)):
         )
 
     # Generate new access token
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRY)
     new_access_token = create_access_token(
         data={"sub": identifier, "role": role}, expires_delta=access_token_expires
     )
@@ -387,11 +406,31 @@ async def update_user(
 
     await db["users"].update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
 
+    # Courses and assignments keep copies of the username; they are rewritten in the background
+    if update_data.get("username") not in (None, user["username"]):
+        await enqueue_rename(db, user_id)
+
     updated_user = await db["users"].find_one({"_id": ObjectId(user_id)})
     updated_user["id"] = str(updated_user.pop("_id"))  # Map MongoDB _id to id
     return UserOut(**updated_user)
 
 
+@router.get("/edit_users/{user_id}/rename_jobs", response_model=list)
+async def get_rename_jobs(
+    user_id: str,
+    current_user: UserInDB = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    # Progress of the latest username propagation jobs for this user
+    if current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to view users")
+
+    jobs = await db["rename_jobs"].find({"user_id": user_id}).sort("created_at", -1).limit(10).to_list(length=10)
+    for job in jobs:
+        job["id"] = str(job.pop("_id"))
+    return jobs
+
+
 @router.get("/edit_users/{user_id}", response_model=UserOut)
 async def get_user_to_edit(
     user_id: str, 
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request, status
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import List
+from typing import List, Optional
 from .auth import get_current_user, get_db
-from models.course import CourseModel, CourseCreate, CourseArchiveAction
+from models.course import CourseModel, CourseCreate, CourseArchiveAction, CourseCloneRequest, CourseBatchCloneRequest
 from models.user import UserInDB
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
+from utils.cache import cached_json, course_tag, invalidate_course
+from utils.course_search import InvalidCursor, search_courses
+from utils.course_lifecycle import COLLECTION as COURSE_JOBS, enqueue_clone_job, enqueue_course_job
+from utils.course_clone import clone_course
+from utils.course_summaries import COURSE_FIELDS, build_summaries, refresh_summaries
 
 
 router = APIRouter()
@@ -19,15 +24,25 @@ async def list_all_courses(
 ):
     skip = (page - 1) * limit  # Calculate the number of courses to skip
 
-    # Filter for non-archived courses
-    filter_condition = {"archived": False}
-
-    # Fetch the total number of non-archived courses
-    total_courses = await db["courses"].count_documents(filter_condition)
-    
-    # Fetch paginated non-archived courses
-    courses_cursor = db["courses"].find(filter_condition).skip(skip).limit(limit)
-    courses = await courses_cursor.to_list(length=limit)
+    # One indexed query against the course_summaries read model returns the page and the total
+    result = await db["course_summaries"].aggregate([
+        {"$match": {"archived": False}},  # Filter for non-archived courses
+        {"$sort": {"created_at": -1}},
+        {"$facet": {
+            "courses": [{"$skip": skip}, {"$limit": limit}, {"$project": {"updated_at": 0}}],
+            "total": [{"$count": "count"}],
+        }},
+    ]).to_list(length=1)
+    courses = result[0]["courses"] if result else []
+    total_courses = result[0]["total"][0]["count"] if result and result[0]["total"] else 0
+
+    # Until the first rebuild has filled the read model, the page is built from the courses themselves
+    if not courses and not await db["course_summaries"].find_one({}, {"_id": 1}):
+        filter_condition = {"archived": False}
+        total_courses = await db["courses"].count_documents(filter_condition)
+        page_courses = await db["courses"].find(filter_condition, COURSE_FIELDS) \
+            .sort("created_at", -1).skip(skip).limit(limit).to_list(length=limit)
+        courses = await build_summaries(db, page_courses)
 
     # If no courses are found, raise an HTTP exception
     if not courses:
@@ -36,28 +51,46 @@ async def list_all_courses(
     # Calculate total pages
     total_pages = (total_courses + limit - 1) // limit
 
-    # Transform the course data into the required format
-    formatted_courses = [
-        {
-            "id": str(course["_id"]),  # Convert ObjectId to string
-            "name": course["name"],
-            "description": course["description"],
-            "owner": course["owner"],
-            "teachers": course.get("teachers", []),
-            "students": course.get("students", []),
-            "assignments": course.get("assignments", []),
-            "archived": course.get("archived", False),
-            "created_at": course.get("created_at")
-        } for course in courses
-    ]
+    # Summaries already carry the card fields; only the id is renamed
+    for course in courses:
+        course["id"] = str(course.pop("_id"))
 
     # Return the paginated response
     return {
-        "courses": formatted_courses,
+        "courses": courses,
         "totalPages": total_pages
     }
 
 
+@router.get("/courses/search", response_model=dict)
+async def search_course_catalogue(
+    q: Optional[str] = Query(None, max_length=200),  # Words to match in course names and descriptions
+    owner: Optional[str] = Query(None),  # Owner user id
+    teacher: Optional[str] = Query(None),  # Teacher user id
+    archived: str = Query("false", pattern="^(true|false|any)$"),
+    cursor: Optional[str] = Query(None),  # nextCursor of the previous page
+    limit: int = Query(20, ge=1, le=100),
+    current_user = Depends(get_current_user),  # Ensure the user is authenticated
+    db = Depends(get_db)
+):
+    # Archived courses are only visible to the staff who can archive them
+    if archived != "false" and current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(status_code=403, detail="Only teachers and admins can search archived courses")
+
+    try:
+        return await search_courses(
+            db,
+            query=(q or "").strip() or None,
+            owner=owner,
+            teacher=teacher,
+            archived=None if archived == "any" else archived == "true",
+            cursor=cursor,
+            limit=limit,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 
 @router.post("/courses", response_model=CourseModel)
 async def add_course(
@@ -86,6 +119,8 @@ async def add_course(
     # Insert into the database
     result = await db["courses"].insert_one(course)
     course["_id"] = result.inserted_id
+    await refresh_summaries(db, [course["_id"]])
+    await invalidate_course(course["_id"])
 
     return CourseModel(**course)
 
@@ -108,6 +143,8 @@ async def edit_course(
     # Update the course with the provided data
     update_data = {k: v for k, v in course_data.items() if v is not None}  # Only update provided fields
     await db["courses"].update_one({"_id": ObjectId(course_id)}, {"$set": update_data})
+    await refresh_summaries(db, [course["_id"]])
+    await invalidate_course(course_id)
 
     # Return the updated course
     updated_course = await db["courses"].find_one({"_id": ObjectId(course_id)})
@@ -136,10 +173,129 @@ async def archive_course(
     if course["owner"]["_id"] != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only the course owner or admin can archive this course")
 
-    # Update the archived status
+    if course.get("deleting"):
+        raise HTTPException(status_code=409, detail="Course is being deleted")
+
+    # Update the archived status; its assignments and materials follow in a background job
     await db["courses"].update_one({"_id": ObjectId(course_id)}, {"$set": {"archived": action.archived}})
+    await refresh_summaries(db, [course["_id"]])
+    await invalidate_course(course_id)
+    job_id = await enqueue_course_job(
+        db, course["_id"], "archive" if action.archived else "restore", str(current_user.id), str(course["owner"]["_id"])
+    )
+
+    return {"status": "success", "archived": action.archived, "job_id": str(job_id)}
+
+
+@router.delete("/courses/{course_id}", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+async def delete_course(
+    course_id: str,
+    current_user: UserInDB = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    course = await db["courses"].find_one({"_id": ObjectId(course_id)}, {"owner": 1})
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    if str(course["owner"]["_id"]) != str(current_user.id) and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only the course owner or admin can delete this course")
+
+    # Hidden right away; assignments, materials and notifications are removed by a background job
+    await db["courses"].update_one({"_id": course["_id"]}, {"$set": {"archived": True, "deleting": True}})
+    await refresh_summaries(db, [course["_id"]])
+    await invalidate_course(course_id)
+    job_id = await enqueue_course_job(db, course["_id"], "delete", str(current_user.id), str(course["owner"]["_id"]))
+
+    return {"status": "accepted", "job_id": str(job_id)}
+
+
+@router.post("/courses/{course_id}/clone", response_model=dict, status_code=status.HTTP_201_CREATED)
+async def clone_single_course(
+    course_id: str,
+    options: CourseCloneRequest,
+    current_user: UserInDB = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    course = await db["courses"].find_one({"_id": ObjectId(course_id)})
+    if not course or course.get("deleting"):
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    # Admins, and the teachers of the course
+    teacher_ids = {str(teacher["_id"]) for teacher in course.get("teachers", [])} | {str(course["owner"]["_id"])}
+    if current_user.role != "admin" and (current_user.role != "teacher" or str(current_user.id) not in teacher_ids):
+        raise HTTPException(status_code=403, detail="Only the course's teachers or admin can clone this course")
+
+    # Copied server-side; material files are shared with the source course, not duplicated
+    new_id = ObjectId()
+    name = options.name or course["name"] + " (copy)"
+    counts = await clone_course(db, course, new_id, name, timedelta(days=options.deadline_offset_days))
+
+    return {"id": str(new_id), "name": name, **counts}
+
 
-    return {"status": "success", "archived": action.archived}
+@router.post("/courses/clone", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+async def clone_courses_batch(
+    options: CourseBatchCloneRequest,
+    current_user: UserInDB = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can clone courses in bulk")
+    if (options.course_ids is None) == (options.teacher_id is None):
+        raise HTTPException(status_code=400, detail="Provide either course_ids or teacher_id")
+
+    if options.course_ids is not None:
+        source_ids = list(dict.fromkeys(ObjectId(course_id) for course_id in options.course_ids))
+    else:
+        # Embedded user ids are stored as strings, but older documents may hold ObjectIds
+        ids = [options.teacher_id] + ([ObjectId(options.teacher_id)] if ObjectId.is_valid(options.teacher_id) else [])
+        source_ids = await db["courses"].distinct(
+            "_id", {"teachers._id": {"$in": ids}, "archived": False, "deleting": {"$ne": True}}
+        )
+    if not source_ids:
+        raise HTTPException(status_code=404, detail="No courses found")
+
+    job_id = await enqueue_clone_job(
+        db, source_ids, options.name_suffix, options.deadline_offset_days, str(current_user.id)
+    )
+    return {"status": "accepted", "job_id": str(job_id), "courses": len(source_ids)}
+
+
+@router.get("/course_jobs/{job_id}", response_model=dict)
+async def get_course_job(
+    job_id: str,
+    current_user: UserInDB = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    job = await db[COURSE_JOBS].find_one({"_id": ObjectId(job_id)}, {"targets": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["owner_id"] != str(current_user.id) and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only the course owner or admin can view course jobs")
+
+    job["id"] = str(job.pop("_id"))
+    if "course_id" in job:
+        job["course_id"] = str(job["course_id"])
+    return job
+
+
+@router.get("/courses/{course_id}/jobs", response_model=list)
+async def get_course_jobs(
+    course_id: str,
+    current_user: UserInDB = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    # Progress of the latest archive/restore/delete jobs; still readable once the course is gone
+    jobs = await db[COURSE_JOBS].find({"course_id": ObjectId(course_id)}).sort("created_at", -1).limit(10).to_list(length=10)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="No jobs found for this course")
+    if jobs[0]["owner_id"] != str(current_user.id) and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only the course owner or admin can view course jobs")
+
+    for job in jobs:
+        job["id"] = str(job.pop("_id"))
+        job["course_id"] = str(job["course_id"])
+    return jobs
 
 
 # New endpoint for enrolling in a course
@@ -169,6 +325,8 @@ async def enroll_in_course(
         {"_id": ObjectId(course_id)},
         {"$push": {"students": {"_id": current_user.id, "name": current_user.username}}}
     )
+    await refresh_summaries(db, [course["_id"]])
+    await invalidate_course(course_id)
 
     # Return the updated course
     updated_course = await db["courses"].find_one({"_id": ObjectId(course_id)})
@@ -197,6 +355,8 @@ async def opt_out_of_course(
         {"_id": ObjectId(course_id)},
         {"$pull": {"students": {"_id": current_user.id}}}
     )
+    await refresh_summaries(db, [course["_id"]])
+    await invalidate_course(course_id)
 
     # Return the updated course
     updated_course = await db["courses"].find_one({"_id": ObjectId(course_id)})
@@ -228,8 +388,17 @@ async def get_course_dashboard_data(course_id: str, db = Depends(get_db)) -> Cou
     return CourseModel(**course)
 
 @router.get("/courses/{course_id}", response_model=CourseModel)
-async def fetch_course_for_dashboard(course_id: str, db = Depends(get_db)):
-    return await get_course_dashboard_data(course_id, db)
+async def fetch_course_for_dashboard(course_id: str, request: Request, db = Depends(get_db)):
+    # Served from the response cache; invalidated by every write to this course.
+    # The route is public, so every caller shares the anonymous bucket
+    return await cached_json(
+        request,
+        route="fetch_course_for_dashboard",
+        params={"course_id": course_id},
+        role="anonymous",
+        tags=[course_tag(course_id)],
+        build=lambda: get_course_dashboard_data(course_id, db),
+    )
 
 # Route to get limited course data for editing
 @router.get("/courses/{course_id}/edit")
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, Query
+from .auth import get_current_user, get_db
+from models.user import UserInDB
+from utils.serialization import ORJSONResponse
+from config import settings
+
+router = APIRouter()
+
+COURSE_CARD_PROJECTION = {"name": 1, "description": 1, "owner": 1, "teachers": 1, "created_at": 1}
+
+
+async def _enrolled_courses(db, student_id: str) -> list:
+    return await db["courses"].find(
+        {"students._id": student_id, "archived": False}, COURSE_CARD_PROJECTION
+    ).to_list(length=None)
+
+
+async def _due_assignments(db, student_id: str, now: datetime, until: datetime) -> list:
+    # Resolves enrolled courses and their upcoming assignments in one round trip, so it can
+    # run alongside the other dashboard queries instead of after them
+    pipeline = [
+        {"$match": {"students._id": student_id, "archived": False}},
+        {"$project": {"name": 1}},
+        {"$lookup": {
+            "from": "assignments",
+            "let": {"course_id": "$_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$course_id", "$$course_id"]},
+                    {"$gte": ["$deadline", now]},
+                    {"$lte": ["$deadline", until]},
+                ]}}},
+                {"$project": {
+                    "title": 1,
+                    "deadline": 1,
+                    "course_id": 1,
+                    "completed": {"$in": [
+                        student_id,
+                        {"$map": {"input": "$students_completed", "in": {"$toString": "$$this.student_id"}}},
+                    ]},
+                }},
+            ],
+            "as": "assignments",
+        }},
+        {"$unwind": "$assignments"},
+        {"$replaceRoot": {"newRoot": {"$mergeObjects": ["$assignments", {"course_name": "$name"}]}}},
+        {"$sort": {"deadline": 1}},
+        {"$limit": settings.DASHBOARD_MAX_ASSIGNMENTS},
+    ]
+    return await db["courses"].aggregate(pipeline).to_list(length=None)
+
+
+async def _unread_notifications(db, email: str) -> int:
+    return await db["notification_history"].count_documents({"recipient_email": email, "is_read": False})
+
+
+@router.get("/me/dashboard")
+async def get_my_dashboard(
+    days: int = Query(settings.DASHBOARD_DUE_WINDOW_DAYS, ge=1, le=90),  # How far ahead to list due assignments
+    current_user: UserInDB = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """Everything the student dashboard needs in one call: enrolled courses, upcoming assignments, unread count."""
+    now = datetime.utcnow()
+    courses, due_assignments, unread = await asyncio.gather(
+        _enrolled_courses(db, current_user.id),
+        _due_assignments(db, current_user.id, now, now + timedelta(days=days)),
+        _unread_notifications(db, current_user.email),
+    )
+
+    return ORJSONResponse(content={
+        "courses": courses,
+        "due_assignments": due_assignments,
+        "unread_notifications": unread,
+    })
@@ -5,10 +5,11 @@ from .auth import get_db
 from utils.smtp import send_email_via_smtp
 from typing import List
 from .auth import get_current_user
+from utils.rate_limit import rate_limit
 
 router = APIRouter()
 
-@router.post("/send-email")
+@router.post("/send-email", dependencies=[Depends(rate_limit("mail"))])
 async def send_email(
     email: EmailSchema,  # The email schema you define earlier
     current_user: dict = Depends(get_current_user),  # Ensure the user is authenticated
@@ -0,0 +1,158 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from bson import ObjectId
+from .auth import get_current_user, get_db
+from models.user import UserInDB
+from utils.serialization import dumps
+from config import settings
+
+router = APIRouter()
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+USER_COLUMNS = ["id", "username", "email", "first_name", "last_name", "role", "is_active", "created_at"]
+ENROLLMENT_COLUMNS = ["course_id", "course_name", "student_id", "student_name"]
+COMPLETION_COLUMNS = ["assignment_id", "assignment_title", "course_id", "student_id", "student_name", "completed_at"]
+
+
+def _encode_batch(rows: List[dict], columns: List[str], fmt: str) -> bytes:
+    if fmt == "ndjson":
+        return b"".join(dumps(row) + b"\n" for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in (row.get(column) for column in columns)
+        ])
+    return buffer.getvalue().encode()
+
+
+async def stream_rows(cursor, columns: List[str], fmt: str) -> AsyncIterator[bytes]:
+    """
+    Encodes rows from a Mongo cursor in fixed-size batches.
+
+    Only one batch is held in memory at a time, so memory stays flat however many rows
+    the cursor returns.
+    """
+    if fmt == "csv":
+        yield _encode_batch([dict(zip(columns, columns))], columns, fmt)
+
+    batch = []
+    async for row in cursor:
+        batch.append(row)
+        if len(batch) >= settings.EXPORT_BATCH_SIZE:
+            yield _encode_batch(batch, columns, fmt)
+            batch = []
+    if batch:
+        yield _encode_batch(batch, columns, fmt)
+
+
+def export_response(cursor, columns: List[str], fmt: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_rows(cursor, columns, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+def _teacher_course_filter(current_user: UserInDB) -> dict:
+    # Admins export everything; teachers only the courses they teach
+    if current_user.role == "admin":
+        return {}
+    if current_user.role == "teacher":
+        return {"teachers._id": current_user.id}
+    raise HTTPException(status_code=403, detail="Not authorized")
+
+
+@router.get("/exports/users")
+async def export_users(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: UserInDB = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    pipeline = [
+        {"$project": {
+            "_id": 0,
+            "id": {"$toString": "$_id"},
+            "username": 1,
+            "email": 1,
+            "first_name": 1,
+            "last_name": 1,
+            "role": 1,
+            "is_active": 1,
+            "created_at": 1,
+        }},
+    ]
+    cursor = db["users"].aggregate(pipeline, batchSize=settings.EXPORT_BATCH_SIZE)
+    return export_response(cursor, USER_COLUMNS, format, "users")
+
+
+@router.get("/exports/enrollments")
+async def export_enrollments(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    course_id: Optional[str] = None,
+    current_user: UserInDB = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    match = _teacher_course_filter(current_user)
+    if course_id:
+        match["_id"] = ObjectId(course_id)
+
+    pipeline = [
+        {"$match": match},
+        {"$project": {"name": 1, "students": 1}},
+        {"$unwind": "$students"},
+        {"$project": {
+            "_id": 0,
+            "course_id": {"$toString": "$_id"},
+            "course_name": "$name",
+            "student_id": {"$toString": "$students._id"},
+            "student_name": "$students.name",
+        }},
+    ]
+    cursor = db["courses"].aggregate(pipeline, batchSize=settings.EXPORT_BATCH_SIZE)
+    return export_response(cursor, ENROLLMENT_COLUMNS, format, "enrollments")
+
+
+@router.get("/exports/completions")
+async def export_completions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    course_id: Optional[str] = None,
+    current_user: UserInDB = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    course_filter = _teacher_course_filter(current_user)
+    match = {}
+    if course_id:
+        match["course_id"] = ObjectId(course_id)
+    if course_filter:
+        # Resolve the teacher's courses up front so the assignment scan stays on course_id
+        course_ids = await db["courses"].distinct("_id", course_filter)
+        if course_id:
+            course_ids = [c for c in course_ids if c == ObjectId(course_id)]
+        match["course_id"] = {"$in": course_ids}
+
+    pipeline = [
+        {"$match": match},
+        {"$project": {"title": 1, "course_id": 1, "students_completed": 1}},
+        {"$unwind": "$students_completed"},
+        {"$project": {
+            "_id": 0,
+            "assignment_id": {"$toString": "$_id"},
+            "assignment_title": "$title",
+            "course_id": {"$toString": "$course_id"},
+            "student_id": {"$toString": "$students_completed.student_id"},
+            "student_name": "$students_completed.student_name",
+            "completed_at": "$students_completed.completed_at",
+        }},
+    ]
+    cursor = db["assignments"].aggregate(pipeline, batchSize=settings.EXPORT_BATCH_SIZE)
+    return export_response(cursor, COMPLETION_COLUMNS, format, "completions")
@@ -1,20 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from starlette.requests import ClientDisconnect
 from bson import ObjectId
-from typing import List
+from typing import List, Optional, Tuple
+from datetime import datetime
 from .auth import get_db, get_current_user
 from models.materials import MaterialModel  # Assuming the MaterialModel is in the models/material.py file
-import os
-import shutil
 from models.common import PyObjectId
+from utils.cache import cached_json, cached_payload, course_tag, etag_matches, invalidate_course
+from utils.serialization import model_projection
+from pydantic import TypeAdapter
+from config import settings
+import orjson
+import re
+from utils.storage import display_name, get_storage, iter_upload, make_storage_key, material_location
+from utils.uploads import (
+    CHUNKS, SESSIONS, LengthExceeded, OffsetMismatch, SessionBusy, append_chunks, discard_session, iter_staged,
+    session_expiry,
+)
+from utils.zipstream import ZipEntry, stream_zip
+from utils.material_search import enqueue_material, search_materials, update_material_fields
 
 router = APIRouter()
 
-# Define upload directory for study materials
-UPLOAD_DIR = "materials"  # Adjust the directory as per your requirements
+# Built once at import; validating a whole list through one adapter avoids a model construction per document
+MaterialList = TypeAdapter(List[MaterialModel])
+MATERIAL_PROJECTION = model_projection(MaterialModel)
+
+# Directory of the local storage backend (created in the app lifespan, served under /materials)
+UPLOAD_DIR = settings.LOCAL_STORAGE_DIR
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range `Range: bytes=...` header into inclusive (start, end) offsets.
+
+    Returns None when the whole file should be sent (no header, or one we do not support).
+    Raises 416 when the range lies outside the file.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+
+def check_material_permission(current_user, course: dict) -> None:
+    # Only admins and the course owner can change a course's materials
+    if current_user.role != "admin" and str(course["owner"]["_id"]) != str(current_user.id):
+        raise HTTPException(status_code=403, detail="You do not have permission to modify this material")
 
-# Ensure the upload directory exists
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # API to upload study material
 @router.post("/materials", response_model=MaterialModel)
@@ -31,53 +78,372 @@ async def upload_material(
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    # Save the uploaded file to the server
-    file_location = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_location, "wb") as f:
-        shutil.copyfileobj(file.file, f)
-    
-    # Calculate file size (in bytes)
-    file_size = os.path.getsize(file_location)
+    # Stream the uploaded file to the configured storage backend
+    storage = get_storage()
+    storage_key = make_storage_key(course_id, file.filename)
+    file_size = await storage.save(storage_key, iter_upload(file), file.content_type)
     
     # Create the material document in the database
     material = MaterialModel(
         title=title,
         description=description,
-        file_url=file_location,  # Store the file path or URL
+        file_url=storage.url(storage_key),  # Store the file path or URL
+        storage_backend=storage.name,
+        storage_key=storage_key,
         file_type=file.content_type,
         file_size=file_size,
         course_id=course_id
     )
     
     # Insert the material into the database
-    result = await db["materials"].insert_one(material.dict())
+    document = material.model_dump(by_alias=True)
+    await db["materials"].insert_one(document)
+    await invalidate_course(course_id)
+
+    # Text extraction happens in the background
+    await enqueue_material(db, document)
     
     # Return the material details
-    material.id = str(result.inserted_id)  # Convert ObjectId to string
     return material
 
+
+# Resumable uploads (tus-style): create a session, PATCH chunks at increasing offsets, HEAD to
+# find where to resume after a dropped connection, then complete to create the material.
+async def get_upload_session(upload_id: PyObjectId, current_user, db) -> dict:
+    session = await db[SESSIONS].find_one({"_id": ObjectId(upload_id)})
+    if not session or (session["created_by"] != str(current_user.id) and current_user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+
+def upload_headers(session: dict) -> dict:
+    return {"Upload-Offset": str(session["offset"]), "Upload-Length": str(session["length"]), "Cache-Control": "no-store"}
+
+
+@router.post("/materials/uploads", status_code=201)
+async def create_upload(
+    title: str = Form(...),  # Title of the material
+    description: str = Form(None),  # Optional description
+    course_id: PyObjectId = Form(...),  # Course ID the material belongs to
+    filename: str = Form(...),  # Name of the file being uploaded
+    content_type: str = Form("application/octet-stream"),
+    length: int = Form(..., ge=0),  # Total size of the file in bytes
+    current_user: dict = Depends(get_current_user),  # Ensure the user is authenticated
+    db = Depends(get_db)
+):
+    course = await db["courses"].find_one({"_id": ObjectId(course_id)})
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    check_material_permission(current_user, course)
+
+    if length > settings.UPLOAD_MAX_SIZE:
+        raise HTTPException(status_code=413, detail="File is larger than the upload limit")
+
+    session = {
+        "_id": ObjectId(),
+        "course_id": ObjectId(course_id),
+        "title": title,
+        "description": description,
+        "filename": filename,
+        "content_type": content_type,
+        "length": length,
+        "offset": 0,
+        "status": "open",
+        "created_by": str(current_user.id),
+        "created_at": datetime.utcnow(),
+        "expires_at": session_expiry(),
+    }
+    await db[SESSIONS].insert_one(session)
+
+    location = f"/api/materials/uploads/{session['_id']}"
+    return JSONResponse(
+        {"upload_id": str(session["_id"]), "offset": 0, "length": length},
+        status_code=201,
+        headers={"Location": location, **upload_headers(session)},
+    )
+
+
+@router.head("/materials/uploads/{upload_id}")
+async def get_upload_offset(
+    upload_id: PyObjectId,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    session = await get_upload_session(upload_id, current_user, db)
+    return Response(status_code=200, headers=upload_headers(session))
+
+
+@router.patch("/materials/uploads/{upload_id}", status_code=204)
+async def upload_chunk(
+    upload_id: PyObjectId,
+    request: Request,
+    upload_offset: int = Header(..., ge=0),  # Byte offset this chunk starts at
+    content_type: str = Header(None),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    if content_type != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Chunks must be sent as application/offset+octet-stream")
+    session = await get_upload_session(upload_id, current_user, db)
+    if session["status"] != "open":
+        raise HTTPException(status_code=409, detail="Upload is already complete")
+
+    try:
+        offset = await append_chunks(db, session, upload_offset, request.stream())
+    except OffsetMismatch:
+        current = await db[SESSIONS].find_one({"_id": session["_id"]})
+        raise HTTPException(status_code=409, detail="Upload-Offset does not match the upload", headers=upload_headers(current))
+    except SessionBusy:
+        raise HTTPException(status_code=423, detail="Another request is writing to this upload")
+    except LengthExceeded:
+        raise HTTPException(status_code=413, detail="Chunk runs past the declared upload length")
+    except ClientDisconnect:
+        # Whatever was staged before the connection dropped is kept; the client resumes from HEAD
+        return Response(status_code=204)
+
+    return Response(status_code=204, headers={**upload_headers(session), "Upload-Offset": str(offset)})
+
+
+@router.post("/materials/uploads/{upload_id}/complete", response_model=MaterialModel)
+async def complete_upload(
+    upload_id: PyObjectId,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    session = await get_upload_session(upload_id, current_user, db)
+
+    # Completing twice returns the same material
+    if session["status"] == "done":
+        material = await db["materials"].find_one({"_id": session["_id"]})
+        if material:
+            return MaterialModel(**material)
+    if session["offset"] != session["length"]:
+        raise HTTPException(status_code=409, detail="Upload is incomplete", headers=upload_headers(session))
+    if not await db["courses"].find_one({"_id": session["course_id"]}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    # Claim the session so a concurrent complete or PATCH cannot interleave
+    storage = get_storage()
+    storage_key = make_storage_key(session["course_id"], session["filename"])
+    now = datetime.utcnow()
+    claimed = await db[SESSIONS].find_one_and_update(
+        {
+            "_id": session["_id"],
+            "status": "open",
+            "offset": session["length"],
+            "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+        },
+        {"$set": {
+            "status": "completing",
+            "storage_backend": storage.name,
+            "storage_key": storage_key,
+            "expires_at": session_expiry(),
+        }},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not claimed:
+        raise HTTPException(status_code=409, detail="Upload is being written to or completed")
+
+    # Move the staged chunks into storage; on failure the session reopens so the client can retry
+    try:
+        file_size = await storage.save(storage_key, iter_staged(db, session["_id"]), session["content_type"])
+    except Exception:
+        await storage.delete_many([storage_key])
+        await db[SESSIONS].update_one({"_id": session["_id"]}, {"$set": {"status": "open"}})
+        raise
+
+    # The material takes the session's id, so a retried completion cannot create a second row
+    material = MaterialModel(
+        _id=session["_id"],
+        title=session["title"],
+        description=session["description"],
+        file_url=storage.url(storage_key),
+        storage_backend=storage.name,
+        storage_key=storage_key,
+        file_type=session["content_type"],
+        file_size=file_size,
+        course_id=session["course_id"],
+    )
+    document = material.model_dump(by_alias=True)
+    try:
+        await db["materials"].insert_one(document)
+    except DuplicateKeyError:
+        pass
+    await enqueue_material(db, document)
+    await db[SESSIONS].update_one({"_id": session["_id"]}, {"$set": {"status": "done"}})
+    await db[CHUNKS].delete_many({"session_id": session["_id"]})
+    await invalidate_course(session["course_id"])
+
+    return material
+
+
+@router.delete("/materials/uploads/{upload_id}", status_code=204)
+async def cancel_upload(
+    upload_id: PyObjectId,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    session = await get_upload_session(upload_id, current_user, db)
+    if session["status"] == "completing":
+        raise HTTPException(status_code=409, detail="Upload is being completed")
+    await discard_session(db, session["_id"])
+    return Response(status_code=204)
+
+
+@router.get("/materials/{material_id}/download")
+async def download_material(
+    material_id: PyObjectId,
+    request: Request,
+    current_user: dict = Depends(get_current_user),  # Ensure the user is authenticated
+    db = Depends(get_db)
+):
+    material = await db["materials"].find_one({"_id": ObjectId(material_id), "archived": {"$ne": True}})
+    if not material:
+        raise HTTPException(status_code=404, detail="Material not found")
+
+    storage, key = material_location(material)
+    filename = display_name(key)
+
+    # Object stores serve the bytes directly, keeping them off the API workers
+    presigned_url = await storage.presigned_url(key, filename)
+    if presigned_url:
+        return RedirectResponse(presigned_url, status_code=307)
+
+    # Otherwise stream it chunk by chunk, honouring Range so media can seek and downloads resume
+    size = await storage.size(key)
+    byte_range = parse_range(request.headers.get("range"), size)
+    headers = {"Accept-Ranges": "bytes", "Content-Disposition": f'attachment; filename="{filename}"'}
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(storage.open(key), media_type=material.get("file_type"), headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        storage.open(key, start, end), status_code=206, media_type=material.get("file_type"), headers=headers
+    )
+
 @router.get("/materials/{course_id}", response_model=List[MaterialModel])
 async def list_materials_for_course(
     course_id: PyObjectId,  # Course ID to filter materials
+    request: Request,
     current_user: dict = Depends(get_current_user),  # Ensure the user is authenticated
     db = Depends(get_db)  # Ensure get_db returns a valid collection or database object
 ):
-    # Check if the course exists
-    course = await db["courses"].find_one({"_id": ObjectId(course_id)})
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
+    async def build():
+        # Check if the course exists
+        course = await db["courses"].find_one({"_id": ObjectId(course_id)})
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+
+        # Get the materials for the course
+        # Archived materials are excluded (and the query is served by the partial index on live materials)
+        materials = await db["materials"].find(
+            {"course_id": course_id, "archived": False}, MATERIAL_PROJECTION
+        ).to_list(length=100)
+
+        # Documents we wrote ourselves are serialized as-is
+        if settings.TRUSTED_DB_READS:
+            return materials
+        return MaterialList.dump_python(MaterialList.validate_python(materials), mode="json", by_alias=True)
+
+    return await cached_json(
+        request,
+        route="list_materials_for_course",
+        params={"course_id": course_id},
+        role=current_user.role,
+        tags=[course_tag(course_id)],
+        build=build,
+    )
 
-    # Get the materials for the course
-    materials = await db["materials"].find({"course_id": course_id}).to_list(length=100)
-    
-    # If no materials are found, return an empty list
-    if not materials:
-        return []
 
-    return [MaterialModel(**material) for material in materials]
 
+def archive_names(materials: List[dict]) -> List[str]:
+    # Stored filenames, made unique within the archive ("notes.pdf", "notes (2).pdf", ...)
+    names, seen = [], {}
+    for material in materials:
+        name = display_name(material_location(material)[1])
+        stem, dot, ext = name.rpartition(".")
+        if not dot:
+            stem, ext = name, ""
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f"{stem} ({seen[name]}){dot}{ext}"
+        names.append(name)
+    return names
 
 
+@router.get("/courses/{course_id}/materials.zip")
+async def download_course_materials(
+    course_id: PyObjectId,
+    request: Request,
+    current_user: dict = Depends(get_current_user),  # Ensure the user is authenticated
+    db = Depends(get_db)
+):
+    async def build():
+        course = await db["courses"].find_one({"_id": course_id}, {"name": 1})
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        materials = await db["materials"].find(
+            {"course_id": course_id, "archived": False},
+            {"file_url": 1, "file_type": 1, "file_size": 1, "storage_backend": 1, "storage_key": 1, "uploaded_at": 1},
+        ).sort("uploaded_at", 1).to_list(length=None)
+        if not materials:
+            raise HTTPException(status_code=404, detail="No materials found for this course")
+        entries = []
+        for name, material in zip(archive_names(materials), materials):
+            storage, key = material_location(material)
+            entries.append({
+                "name": name,
+                "backend": storage.name,
+                "key": key,
+                "size": material["file_size"],
+                "type": material.get("file_type"),
+                "modified": material["uploaded_at"],
+            })
+        return {"course": course["name"], "entries": entries}
+
+    # The listing is cached (and invalidated with the course), so a repeat request only streams the files
+    etag, body = await cached_payload(
+        route="download_course_materials",
+        params={"course_id": course_id},
+        role="any",
+        tags=[course_tag(course_id)],
+        build=build,
+    )
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    listing = orjson.loads(body)
+    entries = [
+        ZipEntry(
+            name=entry["name"],
+            size=entry["size"],
+            content_type=entry["type"],
+            modified=datetime.fromisoformat(entry["modified"]),
+            chunks=get_storage(entry["backend"]).open(entry["key"]),
+        )
+        for entry in listing["entries"]
+    ]
+    archive_name = re.sub(r"[^A-Za-z0-9._-]+", "_", listing["course"]).strip("_") or "materials"
+    headers["Content-Disposition"] = f'attachment; filename="{archive_name}.zip"'
+    return StreamingResponse(stream_zip(entries), media_type="application/zip", headers=headers)
+
+@router.get("/courses/{course_id}/materials/search")
+async def search_course_materials(
+    course_id: PyObjectId,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    current_user: dict = Depends(get_current_user),  # Ensure the user is authenticated
+    db = Depends(get_db)
+):
+    # Ranked by the text index over title, description and the extracted document text
+    if not await db["courses"].find_one({"_id": course_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Course not found")
+    return await search_materials(db, course_id, q, limit)
+
 @router.put("/materials/{material_id}", response_model=MaterialModel)
 async def edit_material(
     material_id: PyObjectId,  # Material ID to edit
@@ -96,8 +462,7 @@ async def edit_material(
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    if current_user["role"] not in ["admin", "owner"] and str(current_user["_id"]) != str(course["owner_id"]):
-        raise HTTPException(status_code=403, detail="You do not have permission to edit this material")
+    check_material_permission(current_user, course)
 
     # Update the material's metadata
     update_data = {
@@ -107,6 +472,8 @@ async def edit_material(
 
     # Update the material in the database
     result = await db["materials"].update_one({"_id": ObjectId(material_id)}, {"$set": update_data})
+    await update_material_fields(db, ObjectId(material_id), title=title, description=description or "")
+    await invalidate_course(material["course_id"])
 
     # If the material was not found or updated, raise an error
     if result.matched_count == 0:
@@ -118,14 +485,14 @@ async def edit_material(
     return MaterialModel(**updated_material)
 
 
-@router.delete("/materials/{material_id}", response_model=MaterialModel)
+@router.delete("/materials/{material_id}", response_model=dict)
 async def archive_material(
     material_id: PyObjectId,  # Material ID to archive
     current_user: dict = Depends(get_current_user),  # Ensure the user is authenticated
     db = Depends(get_db)  # Ensure get_db returns a valid collection or database object
 ):
     # Find the material by ID
-    material = await db["materials"].find_one({"_id": ObjectId(material_id)})
+    material = await db["materials"].find_one({"_id": ObjectId(material_id), "archived": {"$ne": True}})
     if not material:
         raise HTTPException(status_code=404, detail="Material not found")
 
@@ -134,14 +501,48 @@ async def archive_material(
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    if current_user["role"] not in ["admin", "owner"] and str(current_user["_id"]) != str(course["owner_id"]):
-        raise HTTPException(status_code=403, detail="You do not have permission to archive this material")
-
-    # Mark the material as archived by removing it or setting an archived flag
-    result = await db["materials"].delete_one({"_id": ObjectId(material_id)})
+    check_material_permission(current_user, course)
 
-    # If the material was not found or deleted, raise an error
-    if result.deleted_count == 0:
+    # Flag the material as archived; the file is reclaimed by the background sweeper after the retention window
+    result = await db["materials"].update_one(
+        {"_id": ObjectId(material_id), "archived": {"$ne": True}},
+        {"$set": {"archived": True, "archived_at": datetime.utcnow()}}
+    )
+    # If the material was not found or archived concurrently, raise an error
+    if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Material not found")
+    await update_material_fields(db, ObjectId(material_id), archived=True)
+    await invalidate_course(material["course_id"])
 
     return {"detail": "Material archived successfully"}
+
+
+@router.post("/materials/{material_id}/restore", response_model=dict)
+async def restore_material(
+    material_id: PyObjectId,  # Material ID to restore
+    current_user: dict = Depends(get_current_user),  # Ensure the user is authenticated
+    db = Depends(get_db)
+):
+    # Only archived materials whose file has not been reclaimed (or queued for it with a deleted course) can be restored
+    material = await db["materials"].find_one(
+        {"_id": ObjectId(material_id), "archived": True, "reclaiming": {"$ne": True}, "purge": {"$ne": True}}
+    )
+    if not material:
+        raise HTTPException(status_code=404, detail="Archived material not found or already reclaimed")
+
+    course = await db["courses"].find_one({"_id": ObjectId(material["course_id"])})
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    check_material_permission(current_user, course)
+
+    result = await db["materials"].update_one(
+        {"_id": ObjectId(material_id), "reclaiming": {"$ne": True}},
+        {"$set": {"archived": False, "archived_at": None}}
+    )
+    if result.modified_count == 0:
+        raise HTTPException(status_code=404, detail="Archived material not found or already reclaimed")
+    await update_material_fields(db, ObjectId(material_id), archived=False)
+    await invalidate_course(material["course_id"])
+
+    return {"detail": "Material restored successfully"}
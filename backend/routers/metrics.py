@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from .auth import get_current_user
+from models.user import UserInDB
+from utils.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics(
+    format: str = Query("json", pattern="^(json|prometheus)$"),
+    current_user: UserInDB = Depends(get_current_user),
+):
+    # Per-route counters of the worker that serves the request
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view metrics")
+    if format == "prometheus":
+        return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+    return metrics.snapshot()
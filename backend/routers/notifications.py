@@ -3,11 +3,12 @@ from models.notifications import NotificationSchema, NotificationHistoryModel
 from utils.notifications import create_notification
 from .auth import get_current_user, get_db  # Ensure user is authenticated
 from utils.notifications import mark_notification_as_read
+from utils.rate_limit import rate_limit
 
 router = APIRouter()
 
 # Endpoint to create a notification
-@router.post("/create-notification")
+@router.post("/create-notification", dependencies=[Depends(rate_limit("notifications"))])
 async def create_notification_endpoint(
     notification: NotificationSchema,  # The notification schema to define the data
     current_user: dict = Depends(get_current_user),  # Ensure the user is authenticated
@@ -5,10 +5,17 @@ from typing import Optional
 from fastapi import UploadFile, File
 from pathlib import Path
 from bson import ObjectId
-import os
+from pydantic import TypeAdapter
+from config import settings
+from utils.serialization import ORJSONResponse
+from utils.lockout import login_failures
 
 router = APIRouter()
 
+# Built once at import; validating a whole list through one adapter avoids a model construction per user
+UserOutList = TypeAdapter(list[UserOut])
+USER_OUT_PROJECTION = {"username": 1, "email": 1, "first_name": 1, "last_name": 1, "role": 1, "is_active": 1}
+
 async def save_file(upload_file: UploadFile, user_id: str) -> str:
     """Helper function to save uploaded profile picture to a directory."""
     upload_dir = Path(f"profile_pictures/{user_id}")
@@ -36,7 +43,7 @@ async def get_user_profile(user_id: str, current_user: UserInDB = Depends(get_cu
 
     # Create the response model
     if target_user.get("profile_picture"):
-        profile_picture_path = os.getenv("BASE_URL") + target_user.get("profile_picture")
+        profile_picture_path = settings.BASE_URL + target_user.get("profile_picture")
     else:
         profile_picture_path = "None"
     return UserProfileOut(
@@ -124,23 +131,28 @@ async def get_users(
     if current_user.role == "teacher":
         query["role"] = "student"
 
-    # Fetch users from the database (limit 1000 for now)
-    users = await db["users"].find(query).to_list(1000)
-
-    # Return a list of users, mapped to the UserOut schema
-    return [
-        UserOut(
-            id=str(user["_id"]),  # Ensure ObjectId is converted to string
-            username=user.get("username", "Unknown"),  # Use fallback in case username is missing
-            email=user.get("email"),
-            first_name=user.get("first_name"),
-            last_name=user.get("last_name"),
-            role=user.get("role", "student"),  # Default role to "student" if missing
-            is_active=user.get("is_active", True)  # Default is_active to True if missing
-        )
+    # Fetch users from the database (limit 1000 for now), projected to the UserOut fields
+    users = await db["users"].find(query, USER_OUT_PROJECTION).to_list(1000)
+
+    # Map to the UserOut shape
+    rows = [
+        {
+            "id": str(user["_id"]),  # Ensure ObjectId is converted to string
+            "username": user.get("username", "Unknown"),  # Use fallback in case username is missing
+            "email": user.get("email"),
+            "first_name": user.get("first_name"),
+            "last_name": user.get("last_name"),
+            "role": user.get("role", "student"),  # Default role to "student" if missing
+            "is_active": user.get("is_active", True)  # Default is_active to True if missing
+        }
         for user in users
     ]
 
+    # Returning a response directly skips FastAPI's second validation pass through response_model
+    if not settings.TRUSTED_DB_READS:
+        rows = UserOutList.dump_python(UserOutList.validate_python(rows), mode="json")
+    return ORJSONResponse(content=rows)
+
 
 
 @router.get("/users/me", response_model=UserOut)
@@ -204,5 +216,22 @@ async def reset_password(user_id: str, current_user: dict = Depends(get_current_
     return await reset_pass(user_id, db, current_user)
 
 
+@router.get("/users/lockouts")
+async def list_lockouts(current_user: UserInDB = Depends(get_current_user), db=Depends(get_db)):
+    """Lists identifiers currently locked out after repeated login failures (admins only)."""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return await login_failures.locked_identifiers(db)
+
+
+@router.delete("/users/lockouts/{identifier}")
+async def clear_lockout(identifier: str, current_user: UserInDB = Depends(get_current_user), db=Depends(get_db)):
+    """Clears the lockout and failure count for a username or email (admins only)."""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
 
+    if not await login_failures.unlock(db, identifier):
+        raise HTTPException(status_code=404, detail="Identifier is not locked")
 
+    return {"detail": f"Lockout cleared for {identifier}"}
@@ -0,0 +1,31 @@
+"""
+Sets archived=False on materials uploaded before soft-delete, which listings and the partial indexes skip otherwise.
+
+Run once from the backend directory after upgrading; running it again is harmless:
+
+    python -m scripts.backfill_archived_flag
+"""
+import argparse
+import asyncio
+import time
+from motor.motor_asyncio import AsyncIOMotorClient
+from config import settings
+from utils.reclaim import backfill_archived_flag
+
+
+async def backfill() -> None:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DB_NAME]
+    start = time.perf_counter()
+    updated = await backfill_archived_flag(db)
+    print(f"Flagged {updated} materials as not archived in {time.perf_counter() - start:.1f}s")
+    client.close()
+
+
+def main() -> None:
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    asyncio.run(backfill())
+
+
+if __name__ == "__main__":
+    main()
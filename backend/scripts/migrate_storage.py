@@ -0,0 +1,82 @@
+"""
+Moves existing material files from one storage backend to another.
+
+Run from the backend directory:
+
+    python -m scripts.migrate_storage --source local --target s3 --dry-run
+    python -m scripts.migrate_storage --source local --target s3 --delete-source
+
+Each file is streamed from the source into the target, then its `materials` rows are repointed.
+Files shared by several rows are copied once. Re-running skips rows already moved.
+"""
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from config import settings
+from utils.storage import get_storage, init_storage, material_location
+
+
+async def migrate_one(db, url: str, target, delete_source: bool, dry_run: bool) -> int:
+    material = await db["materials"].find_one({"file_url": url})
+    source, key = material_location(material)
+    size = await source.size(key)
+    if dry_run:
+        print(f"would move {url} ({size} bytes)")
+        return size
+
+    await target.save(key, source.open(key), material.get("file_type"))
+    await db["materials"].update_many(
+        {"file_url": url},
+        {"$set": {"storage_backend": target.name, "storage_key": key, "file_url": target.url(key)}},
+    )
+    if delete_source:
+        await source.delete_many([key])
+    print(f"moved {url} -> {target.url(key)} ({size} bytes)")
+    return size
+
+
+async def migrate(source_name: str, target_name: str, concurrency: int, delete_source: bool, dry_run: bool) -> None:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DB_NAME]
+    init_storage(db)
+    target = get_storage(target_name)
+
+    # Rows written before storage backends existed have no storage_backend and live on local disk
+    query = {"storage_backend": source_name}
+    if source_name == "local":
+        query = {"$or": [query, {"storage_backend": {"$exists": False}}]}
+    urls = await db["materials"].distinct("file_url", query)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def run(url):
+        nonlocal failures
+        async with semaphore:
+            try:
+                return await migrate_one(db, url, target, delete_source, dry_run)
+            except Exception as e:
+                failures += 1
+                print(f"failed {url}: {e}")
+                return 0
+
+    moved = await asyncio.gather(*(run(url) for url in urls))
+    print(f"{len(urls) - failures} of {len(urls)} files, {sum(moved)} bytes {'to move' if dry_run else 'moved'}")
+    client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", required=True, help="backend to move files out of")
+    parser.add_argument("--target", required=True, help="backend to move files into")
+    parser.add_argument("--concurrency", type=int, default=4, help="files transferred in parallel")
+    parser.add_argument("--delete-source", action="store_true", help="delete each file from the source once moved")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be moved")
+    args = parser.parse_args()
+    if args.source == args.target:
+        parser.error("--source and --target must differ")
+    asyncio.run(migrate(args.source, args.target, args.concurrency, args.delete_source, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
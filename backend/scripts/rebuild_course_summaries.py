@@ -0,0 +1,33 @@
+"""
+Rebuilds the course_summaries read model from courses, assignments and materials.
+
+Run from the backend directory after a restore or bulk import, or to backfill the collection:
+
+    python -m scripts.rebuild_course_summaries --batch-size 500
+"""
+import argparse
+import asyncio
+import time
+from motor.motor_asyncio import AsyncIOMotorClient
+from config import settings
+from utils.course_summaries import rebuild_summaries
+
+
+async def rebuild(batch_size: int) -> None:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DB_NAME]
+    start = time.perf_counter()
+    written = await rebuild_summaries(db, batch_size)
+    print(f"Rebuilt {written} course summaries in {time.perf_counter() - start:.1f}s")
+    client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=settings.COURSE_SUMMARY_BATCH_SIZE, help="courses recomputed per batch")
+    args = parser.parse_args()
+    asyncio.run(rebuild(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
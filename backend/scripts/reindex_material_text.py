@@ -0,0 +1,40 @@
+"""
+Queues every live material for text extraction, e.g. to backfill material_text after deploying search.
+
+Run from the backend directory; the app's extraction workers then pick the materials up:
+
+    python -m scripts.reindex_material_text
+"""
+import argparse
+import asyncio
+import time
+from motor.motor_asyncio import AsyncIOMotorClient
+from config import settings
+from utils.material_search import COLLECTION, enqueue_material
+
+
+async def reindex(missing_only: bool) -> None:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DB_NAME]
+    start = time.perf_counter()
+    indexed = set(await db[COLLECTION].distinct("_id")) if missing_only else set()
+    queued = 0
+    async for material in db["materials"].find(
+        {"archived": False}, {"course_id": 1, "title": 1, "description": 1, "archived": 1}
+    ):
+        if material["_id"] not in indexed:
+            await enqueue_material(db, material)
+            queued += 1
+    print(f"Queued {queued} materials for text extraction in {time.perf_counter() - start:.1f}s")
+    client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--missing-only", action="store_true", help="skip materials that already have a search row")
+    args = parser.parse_args()
+    asyncio.run(reindex(args.missing_only))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Production entry point.
+
+Starts SERVER_WORKERS worker processes (default: one per CPU), each with its own event
+loop and MongoDB client created in the app's lifespan. uvloop and httptools are used
+when installed. Set SERVER_USE_GUNICORN=true to run the same workers under gunicorn's
+process manager instead of uvicorn's.
+
+    python server.py
+
+`python main.py` remains the single-process development server with auto-reload.
+"""
+import importlib.util
+import os
+from config import settings
+
+APP = "main:app"
+
+
+def worker_count() -> int:
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def _choose(module: str, preferred: str) -> str:
+    return preferred if importlib.util.find_spec(module) else "auto"
+
+
+def run_uvicorn() -> None:
+    import uvicorn
+
+    uvicorn.run(
+        APP,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=worker_count(),
+        loop=_choose("uvloop", "uvloop"),
+        http=_choose("httptools", "httptools"),
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        proxy_headers=True,
+        access_log=False,
+    )
+
+
+def run_gunicorn() -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class LMSApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{settings.SERVER_HOST}:{settings.SERVER_PORT}")
+            self.cfg.set("workers", worker_count())
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("backlog", settings.SERVER_BACKLOG)
+            self.cfg.set("keepalive", settings.SERVER_KEEPALIVE)
+            self.cfg.set("graceful_timeout", settings.SERVER_GRACEFUL_TIMEOUT)
+            # Workers only heartbeat between requests; keep the kill timeout above the graceful one
+            self.cfg.set("timeout", settings.SERVER_GRACEFUL_TIMEOUT + 30)
+
+        def load(self):
+            from main import app
+            return app
+
+    LMSApplication().run()
+
+
+if __name__ == "__main__":
+    if settings.SERVER_USE_GUNICORN:
+        run_gunicorn()
+    else:
+        run_uvicorn()
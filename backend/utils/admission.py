@@ -0,0 +1,140 @@
+import math
+import time
+from typing import Dict, Optional
+from config import settings
+from utils.metrics import metrics
+from utils.serialization import ORJSONResponse
+
+metrics.register("admission_limit", "gauge", "Current adaptive concurrency limit of the route class")
+metrics.register("admission_inflight", "gauge", "Requests of the route class being processed")
+metrics.register("admission_shed_total", "counter", "Requests rejected with GEN_503 by admission control")
+
+# Paths handled before a token exists; bcrypt makes them CPU-heavy
+AUTH_PATHS = {"/api/login", "/api/refresh", "/api/register"}
+
+# Never shed: the metrics endpoint is how an overload is diagnosed
+EXEMPT_PATHS = {"/api/metrics"}
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Maps a request to its admission class ("auth", "uploads", "reads", "writes"), or None if not limited."""
+    if not path.startswith("/api/") or path in EXEMPT_PATHS:
+        return None
+    if path in AUTH_PATHS:
+        return "auth"
+    if method in ("POST", "PUT", "PATCH") and (path == "/api/materials" or path.startswith("/api/materials/uploads")):
+        return "uploads"
+    if method in ("GET", "HEAD"):
+        return "reads"
+    return "writes"
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit for one route class, adapted with AIMD on observed latency.
+
+    Each completed request is a sample: one slower than the class's target latency (or answered
+    503/504 downstream) cuts the limit by ADMISSION_BACKOFF, at most once per target-latency
+    window so a burst of slow completions counts once. Fast requests grow the limit by 1/limit,
+    i.e. about one slot per limit's worth of requests, and only while at least half of it is in
+    use. Requests over the limit are rejected at once rather than queued, which keeps the latency
+    of the admitted ones bounded.
+    """
+
+    def __init__(self, name: str, initial: float, minimum: float, maximum: float, target_latency: float):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.inflight = 0
+        self._last_decrease = 0.0
+        metrics.set("admission_limit", name, self.limit)
+
+    def try_acquire(self) -> bool:
+        if self.inflight >= math.floor(self.limit):
+            metrics.inc("admission_shed_total", self.name)
+            return False
+        self.inflight += 1
+        metrics.set("admission_inflight", self.name, self.inflight)
+        return True
+
+    def release(self, latency: float, overloaded: bool = False) -> None:
+        self.inflight -= 1
+        if overloaded or latency > self.target_latency:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.target_latency:
+                self.limit = max(self.minimum, self.limit * settings.ADMISSION_BACKOFF)
+                self._last_decrease = now
+        elif self.inflight + 1 >= self.limit / 2:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        metrics.set("admission_limit", self.name, self.limit)
+        metrics.set("admission_inflight", self.name, self.inflight)
+
+    def retry_after(self) -> int:
+        # Roughly when a slot frees up: one target latency
+        return max(1, math.ceil(self.target_latency))
+
+
+_limits: Optional[Dict[str, AdaptiveLimit]] = None
+
+
+def get_limit(method: str, path: str) -> Optional[AdaptiveLimit]:
+    """Returns this worker's limiter for the request's class; the limiters are built on first use."""
+    global _limits
+    if _limits is None:
+        _limits = {
+            name: AdaptiveLimit(
+                name, spec["initial"], spec["min"], spec["max"], spec["target_latency"]
+            )
+            for name, spec in settings.ADMISSION_LIMITS.items()
+        }
+    name = route_class(method, path)
+    return _limits.get(name) if name else None
+
+
+def shed_response(limit: AdaptiveLimit) -> ORJSONResponse:
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": {
+            "error_code": "GEN_503_SERVICE_UNAVAILABLE",
+            "message": settings.GENERAL_ERRORS["GEN_503_SERVICE_UNAVAILABLE"],
+        }},
+        headers={"Retry-After": str(limit.retry_after())},
+    )
+
+
+class AdmissionMiddleware:
+    """
+    Sheds requests beyond the adaptive concurrency limit of their route class with GEN_503.
+
+    A plain ASGI middleware rather than an "http" one: the app call only returns once the whole
+    body has been sent, so a streamed response (an export, a zip, a download) holds its slot,
+    and is timed, until its last chunk rather than its first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = get_limit(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        if not limit.try_acquire():
+            await shed_response(limit)(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        overloaded = False
+
+        async def send_tracked(message):
+            nonlocal overloaded
+            if message["type"] == "http.response.start":
+                overloaded = message["status"] in (503, 504)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_tracked)
+        finally:
+            limit.release(time.monotonic() - started, overloaded)
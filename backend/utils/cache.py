@@ -0,0 +1,196 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlencode
+from fastapi import Request, Response
+from config import settings
+from utils.read_routing import read_state
+from utils.redis_client import get_redis
+from utils.serialization import dumps
+
+# A cached entry is the ETag together with the serialized JSON body
+CachedResponse = Tuple[str, bytes]
+
+def course_tag(course_id: Any) -> str:
+    return f"course:{course_id}"
+
+
+def make_cache_key(route: str, params: Dict[str, Any], role: str) -> str:
+    """Builds a cache key from the route name, its (sorted) parameters and the caller's role."""
+    query = urlencode(sorted((k, str(v)) for k, v in params.items() if v is not None))
+    return f"{route}|{role}|{query}"
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with a per-entry TTL and tag-based invalidation.
+
+    All operations are synchronous under the hood; they are exposed as coroutines so the
+    in-process and Redis backends are interchangeable.
+    """
+
+    def __init__(self, max_entries: int, default_ttl: int):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        # key -> (expiry, entry, tags); each tag maps back to its keys until they are removed
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+
+    def _remove(self, key: str) -> None:
+        # Drops the entry and its key from its tags, so expired and evicted entries leave nothing behind
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        for tag in item[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, value, _ = item
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str] = (), ttl: Optional[int] = None) -> None:
+        self._remove(key)
+        tags = tuple(tags)
+        self._entries[key] = (time.monotonic() + (ttl or self.default_ttl), value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    async def invalidate_tags(self, *tags: str) -> None:
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+
+class RedisCache:
+    """
+    Cache backed by any Redis-compatible server, shared by every worker.
+
+    Each tag is a Redis set holding the keys that depend on it, so invalidation is a
+    SMEMBERS followed by a DEL of those keys.
+    """
+
+    def __init__(self, client, default_ttl: int, prefix: str = "lms:cache:"):
+        self.client = client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b"\n")
+        return etag.decode(), body
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str] = (), ttl: Optional[int] = None) -> None:
+        ttl = ttl or self.default_ttl
+        etag, body = value
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self.prefix + key, etag.encode() + b"\n" + body, ex=ttl)
+            for tag in tags:
+                pipe.sadd(self.prefix + "tag:" + tag, key)
+                pipe.expire(self.prefix + "tag:" + tag, ttl)
+            await pipe.execute()
+
+    async def invalidate_tags(self, *tags: str) -> None:
+        for tag in tags:
+            tag_key = self.prefix + "tag:" + tag
+            keys = await self.client.smembers(tag_key)
+            if keys:
+                await self.client.delete(*(self.prefix + k.decode() for k in keys))
+            await self.client.delete(tag_key)
+
+
+_cache = None
+
+
+def get_cache():
+    """Returns the configured cache backend, creating it on first use."""
+    global _cache
+    if _cache is None:
+        if settings.CACHE_BACKEND == "redis":
+            client = get_redis()
+            if client is None:
+                raise RuntimeError("CACHE_BACKEND is 'redis' but REDIS_URL is not set")
+            _cache = RedisCache(client, settings.CACHE_TTL)
+        else:
+            _cache = MemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL)
+    return _cache
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison with If-None-Match: compressed responses carry the ETag as W/"..."."""
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+def etag_response(request: Request, etag: str, body: bytes) -> Response:
+    """Returns the cached body, or an empty 304 when the client already holds this version."""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def cached_json(
+    request: Request,
+    route: str,
+    params: Dict[str, Any],
+    role: str,
+    tags: Iterable[str],
+    build: Callable[[], Awaitable[Any]],
+    ttl: Optional[int] = None,
+) -> Response:
+    """
+    Serves a JSON response from the cache, calling `build` to produce it on a miss.
+
+    Errors raised by `build` (e.g. a 404) propagate and are never cached.
+    """
+    entry = await cached_payload(route, params, role, tags, build, ttl)
+    return etag_response(request, *entry)
+
+
+async def cached_payload(
+    route: str,
+    params: Dict[str, Any],
+    role: str,
+    tags: Iterable[str],
+    build: Callable[[], Awaitable[Any]],
+    ttl: Optional[int] = None,
+) -> CachedResponse:
+    """Like cached_json, but returns the (etag, JSON body) entry for handlers that build a different response from it."""
+    cache = get_cache()
+    key = make_cache_key(route, params, role)
+    # A client waiting for its own write skips entries that may predate it; entries built from
+    # secondaries may miss other users' recent writes, so they are kept only briefly
+    state = read_state.get()
+    entry = None if state == "causal" else await cache.get(key)
+    if entry is None:
+        body = dumps(await build())
+        entry = (make_etag(body), body)
+        if state is not None:
+            ttl = min(ttl or settings.CACHE_TTL, settings.REPLICA_CACHE_TTL)
+        await cache.set(key, entry, tags=tags, ttl=ttl)
+    return entry
+
+
+# Invalidation hooks, fired by every handler that writes course, assignment or material data
+async def invalidate_course(course_id: Any) -> None:
+    await get_cache().invalidate_tags(course_tag(course_id))
@@ -0,0 +1,203 @@
+import asyncio
+import gzip
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+from config import settings
+from utils.metrics import metrics
+from utils.zipstream import STORED_TYPES
+
+metrics.register("compression_bytes_in_total", "counter", "Response bytes before compression")
+metrics.register("compression_bytes_out_total", "counter", "Response bytes sent after compression")
+metrics.register("compression_bytes_saved_total", "counter", "Response bytes saved by compression")
+
+# brotli and zstd are used when their packages are installed; gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        # Sync flush: each chunk of a streamed export reaches the client as soon as it is produced
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush()
+
+
+class _BrotliStream:
+    def __init__(self, level: int):
+        self._c = brotli.Compressor(quality=level)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.compress(data) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+def _codecs() -> Dict[str, Tuple[Callable[[bytes, int], bytes], Callable[[int], object]]]:
+    # Content-Encoding -> (whole-body compressor, streaming compressor), in order of preference
+    codecs = {}
+    if zstandard is not None:
+        codecs["zstd"] = (lambda data, level: zstandard.ZstdCompressor(level=level).compress(data), _ZstdStream)
+    if brotli is not None:
+        codecs["br"] = (lambda data, level: brotli.compress(data, quality=level), _BrotliStream)
+    codecs["gzip"] = (lambda data, level: gzip.compress(data, level, mtime=0), _GzipStream)
+    return codecs
+
+
+CODECS = _codecs()
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    Picks the Content-Encoding for an Accept-Encoding header, or None to send the body as is.
+
+    The client's q-values decide; among equally weighted encodings zstd is preferred over br
+    over gzip, as they compress JSON better for the same CPU.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+        weights[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding in CODECS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _compressible(headers: List[Tuple[bytes, bytes]]) -> bool:
+    for name, value in headers:
+        # Material downloads serve byte ranges of the stored file; compressing would break the offsets
+        if name in (b"content-encoding", b"accept-ranges", b"content-range"):
+            return False
+        if name == b"content-type" and value.decode("latin-1").lower().startswith(STORED_TYPES):
+            return False
+    return True
+
+
+class CompressionMiddleware:
+    """
+    Compresses /api responses with the encoding negotiated from Accept-Encoding.
+
+    Bodies under COMPRESSION_MIN_SIZE, responses that are already encoded, material downloads
+    (which serve byte ranges) and media types that are compressed already (zip archives,
+    images, PDFs, ...) are sent unchanged, as is everything outside /api, such as the files
+    under /materials. Bodies from COMPRESSION_THREAD_THRESHOLD bytes up are compressed in a
+    thread so the event loop keeps serving other requests. Streamed responses (exports) are
+    compressed chunk by chunk. A compressed response's ETag is made weak, since it names the
+    uncompressed representation.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+        encoding = negotiate(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        whole, stream_class = CODECS[encoding]
+        level = settings.COMPRESSION_LEVELS[encoding]
+        start = None
+        stream = None
+        sent_in = sent_out = 0
+
+        def record(raw: int, compressed: int) -> None:
+            route = getattr(scope.get("route"), "name", None) or "unmatched"
+            metrics.inc("compression_bytes_in_total", route, raw)
+            metrics.inc("compression_bytes_out_total", route, compressed)
+            metrics.inc("compression_bytes_saved_total", route, raw - compressed)
+
+        async def send_compressed(message):
+            nonlocal start, stream, sent_in, sent_out
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if stream is None:
+                # First body message: decide whether this response is compressed at all
+                headers = list(start.get("headers", []))
+                if (start["status"] < 200 or start["status"] in (204, 304) or not _compressible(headers)
+                        or (not more_body and len(body) < settings.COMPRESSION_MIN_SIZE)):
+                    await send(start)
+                    await send(message)
+                    start = None
+                    return
+                headers = [(name, value) for name, value in headers if name != b"content-length"]
+                headers = [
+                    (name, b"W/" + value if name == b"etag" and not value.startswith(b"W/") else value)
+                    for name, value in headers
+                ]
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+
+                if not more_body:
+                    if len(body) >= settings.COMPRESSION_THREAD_THRESHOLD:
+                        compressed = await asyncio.to_thread(whole, body, level)
+                    else:
+                        compressed = whole(body, level)
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    record(len(body), len(compressed))
+                    start = None
+                    return
+                await send({**start, "headers": headers})
+                stream = stream_class(level)
+
+            if len(body) >= settings.COMPRESSION_THREAD_THRESHOLD:
+                out = await asyncio.to_thread(stream.chunk, body)
+            else:
+                out = stream.chunk(body) if body else b""
+            if not more_body:
+                out += stream.finish()
+            sent_in += len(body)
+            sent_out += len(out)
+            await send({"type": "http.response.body", "body": out, "more_body": more_body})
+            if not more_body:
+                record(sent_in, sent_out)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from utils.course_summaries import refresh_summaries
+from utils.material_search import COLLECTION as MATERIAL_TEXT
+
+
+async def _merge_into(db, source: str, pipeline: list, target: str) -> None:
+    # The copies are built and written by the server; no document passes through the app
+    await db[source].aggregate(
+        pipeline + [{"$merge": {"into": target, "whenMatched": "fail", "whenNotMatched": "insert"}}]
+    ).to_list(length=None)
+
+
+async def _discard_partial_clone(db, target_id: ObjectId) -> None:
+    # Rows left by an attempt that stopped before the course itself was written
+    leftovers = await db["materials"].distinct("_id", {"course_id": target_id})
+    await db["assignments"].delete_many({"course_id": target_id})
+    await db["materials"].delete_many({"course_id": target_id})
+    await db[MATERIAL_TEXT].delete_many({"_id": {"$in": leftovers}})
+
+
+async def clone_course(db, source: dict, target_id: ObjectId, name: str, deadline_offset: timedelta) -> Optional[dict]:
+    """
+    Copies a course, its live assignments and its live materials into a new course `target_id`.
+
+    Assignments are copied with their deadlines shifted by `deadline_offset` and no completions.
+    Materials are copied as references: the new rows point at the same stored files (the reclaimer
+    only deletes a file once no other row uses it), and their extracted search text is copied too.
+    The copies are made with $merge aggregations; the course row is written last, so a clone is
+    either complete or invisible, and cloning again into the same `target_id` is safe.
+    Returns the counts copied, or None when `target_id` already exists.
+    """
+    if await db["courses"].find_one({"_id": target_id}, {"_id": 1}):
+        return None
+    await _discard_partial_clone(db, target_id)
+    now = datetime.utcnow()
+
+    await _merge_into(db, "assignments", [
+        {"$match": {"course_id": source["_id"], "archived": {"$ne": True}}},
+        {"$addFields": {
+            "course_id": target_id,
+            "cloned_from": "$_id",
+            "students_completed": [],
+            "deadline": {"$add": ["$deadline", int(deadline_offset.total_seconds() * 1000)]},
+        }},
+        {"$project": {"_id": 0, "archived": 0, "archived_with_course": 0}},
+    ], "assignments")
+
+    await _merge_into(db, "materials", [
+        {"$match": {"course_id": source["_id"], "archived": False}},
+        {"$addFields": {"course_id": target_id, "cloned_from": "$_id", "uploaded_at": now}},
+        {"$project": {"_id": 0, "archived_at": 0, "archived_with_course": 0, "reclaiming": 0, "purge": 0}},
+    ], "materials")
+
+    # Search rows for the copies; materials not extracted yet are queued for the extraction worker
+    await _merge_into(db, "materials", [
+        {"$match": {"course_id": target_id}},
+        {"$lookup": {"from": MATERIAL_TEXT, "localField": "cloned_from", "foreignField": "_id", "as": "text"}},
+        {"$unwind": {"path": "$text", "preserveNullAndEmptyArrays": True}},
+        {"$project": {
+            "course_id": 1,
+            "title": 1,
+            "description": {"$ifNull": ["$description", ""]},
+            "archived": {"$literal": False},
+            "body": {"$ifNull": ["$text.body", ""]},
+            "status": {"$cond": [{"$eq": ["$text.status", "indexed"]}, "indexed", "pending"]},
+            "queued_at": {"$literal": now},
+            "indexed_at": "$text.indexed_at",
+        }},
+    ], MATERIAL_TEXT)
+
+    await db["courses"].insert_one({
+        "_id": target_id,
+        "name": name,
+        "description": source["description"],
+        "owner": source["owner"],
+        "teachers": source.get("teachers", []),
+        "students": [],
+        "assignments": [],
+        "archived": False,
+        "created_at": now,
+        "cloned_from": source["_id"],
+    })
+    await refresh_summaries(db, [target_id])
+    return {
+        "assignments": await db["assignments"].count_documents({"course_id": target_id}),
+        "materials": await db["materials"].count_documents({"course_id": target_id}),
+    }
+
+
+async def clone_courses(db, job: dict) -> int:
+    """
+    Runs a batch clone job: every (source, target) pair in `job["targets"]`, recording progress.
+
+    Targets were assigned when the job was queued, so a job resumed after a crash skips the
+    courses it already cloned. Returns the number of courses cloned.
+    """
+    offset = timedelta(days=job["deadline_offset_days"])
+    cloned = 0
+    for pair in job["targets"]:
+        source = await db["courses"].find_one({"_id": pair["source"]})
+        if source is None or source.get("deleting"):
+            outcome = "skipped"
+        else:
+            counts = await clone_course(db, source, pair["target"], source["name"] + job["name_suffix"], offset)
+            outcome = "cloned" if counts is not None else "exists"
+            cloned += counts is not None
+        await db["course_jobs"].update_one(
+            {"_id": job["_id"]},
+            {"$inc": {f"progress.{outcome}": 1}, "$set": {"heartbeat_at": datetime.utcnow()}},
+        )
+    return cloned
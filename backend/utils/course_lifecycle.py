@@ -0,0 +1,226 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from config import settings
+from utils.cache import invalidate_course
+from utils.course_clone import clone_courses
+from utils.course_summaries import refresh_summaries
+from utils.material_search import COLLECTION as MATERIAL_TEXT
+
+# Course archive, restore and delete cascades and batch clones, run in the background by every app worker
+COLLECTION = "course_jobs"
+
+_transactions_supported: Optional[bool] = None
+
+
+async def transactions_supported(db) -> bool:
+    """Multi-document transactions need a replica set or a sharded cluster; checked once per worker."""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = await db.command("hello")
+            _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception:
+            _transactions_supported = False
+    return _transactions_supported
+
+
+async def run_in_transaction(db, operations: Callable[[object], Awaitable[None]]) -> None:
+    """Runs `operations(session)` in a transaction where the deployment supports one, otherwise directly."""
+    if not await transactions_supported(db):
+        await operations(None)
+        return
+    async with await db.client.start_session() as session:
+        await session.with_transaction(operations)
+
+
+async def enqueue_course_job(db, course_id: ObjectId, action: str, requested_by: str, owner_id: str) -> ObjectId:
+    """
+    Queues a cascade for the course and returns the job id; a pending job for the same course is reused.
+
+    The job brings the course's assignments and materials in line with the course itself when it
+    runs, so an archive quickly followed by a restore (or a delete) is handled by a single job.
+    """
+    now = datetime.utcnow()
+    job = await db[COLLECTION].find_one_and_update(
+        {"course_id": course_id, "status": "pending"},
+        {
+            "$set": {"action": action, "requested_by": requested_by},
+            "$setOnInsert": {"course_id": course_id, "owner_id": owner_id, "status": "pending", "progress": {}, "created_at": now},
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return job["_id"]
+
+
+async def enqueue_clone_job(db, source_ids: List[ObjectId], name_suffix: str, deadline_offset_days: int, requested_by: str) -> ObjectId:
+    """Queues a batch clone; each source course is assigned the id of its copy up front."""
+    result = await db[COLLECTION].insert_one({
+        "action": "clone",
+        "targets": [{"source": source_id, "target": ObjectId()} for source_id in source_ids],
+        "name_suffix": name_suffix,
+        "deadline_offset_days": deadline_offset_days,
+        "requested_by": requested_by,
+        "owner_id": requested_by,
+        "status": "pending",
+        "progress": {},
+        "created_at": datetime.utcnow(),
+    })
+    return result.inserted_id
+
+
+async def _in_batches(db, job_id, step: str, collection: str, match: dict, apply: Callable) -> int:
+    """
+    Applies `apply(ids, session)` to the documents matching `match`, COURSE_JOB_BATCH_SIZE at a time.
+
+    Each batch and the job's progress counter are written in one transaction, so a job resumed
+    after a crash neither skips nor double-counts a batch. `apply` must make the documents stop
+    matching. Returns the number of documents processed.
+    """
+    done = 0
+    while True:
+        batch = await db[collection].find(match, {"_id": 1}).limit(settings.COURSE_JOB_BATCH_SIZE).to_list(length=None)
+        if not batch:
+            return done
+        ids = [doc["_id"] for doc in batch]
+
+        async def operations(session):
+            await apply(ids, session)
+            await db[COLLECTION].update_one(
+                {"_id": job_id},
+                {"$inc": {f"progress.{step}": len(ids)}, "$set": {"heartbeat_at": datetime.utcnow()}},
+                session=session,
+            )
+
+        await run_in_transaction(db, operations)
+        done += len(ids)
+
+
+async def _archive(db, job_id, course_id: ObjectId) -> None:
+    # Assignments and materials archived by the course are marked so a restore brings back only those
+    async def archive_assignments(ids: List[ObjectId], session):
+        await db["assignments"].update_many(
+            {"_id": {"$in": ids}}, {"$set": {"archived": True, "archived_with_course": True}}, session=session
+        )
+
+    async def archive_materials(ids: List[ObjectId], session):
+        await db["materials"].update_many(
+            {"_id": {"$in": ids}}, {"$set": {"archived": True, "archived_with_course": True}}, session=session
+        )
+        await db[MATERIAL_TEXT].update_many({"_id": {"$in": ids}}, {"$set": {"archived": True}}, session=session)
+
+    await _in_batches(db, job_id, "assignments", "assignments",
+                      {"course_id": course_id, "archived": {"$ne": True}}, archive_assignments)
+    # No archived_at: files of an archived course are kept until the course is deleted
+    await _in_batches(db, job_id, "materials", "materials",
+                      {"course_id": course_id, "archived": False}, archive_materials)
+    await db["email_outbox"].update_many(
+        {"course_id": course_id, "status": "pending"}, {"$set": {"status": "cancelled"}}
+    )
+
+
+async def _restore(db, job_id, course_id: ObjectId) -> None:
+    async def restore_assignments(ids: List[ObjectId], session):
+        await db["assignments"].update_many(
+            {"_id": {"$in": ids}}, {"$set": {"archived": False}, "$unset": {"archived_with_course": ""}}, session=session
+        )
+
+    async def restore_materials(ids: List[ObjectId], session):
+        await db["materials"].update_many(
+            {"_id": {"$in": ids}}, {"$set": {"archived": False}, "$unset": {"archived_with_course": ""}}, session=session
+        )
+        await db[MATERIAL_TEXT].update_many({"_id": {"$in": ids}}, {"$set": {"archived": False}}, session=session)
+
+    await _in_batches(db, job_id, "assignments", "assignments",
+                      {"course_id": course_id, "archived_with_course": True}, restore_assignments)
+    await _in_batches(db, job_id, "materials", "materials",
+                      {"course_id": course_id, "archived_with_course": True, "reclaiming": {"$ne": True}}, restore_materials)
+
+
+async def _delete(db, job_id, course_id: ObjectId) -> None:
+    async def delete_assignments(ids: List[ObjectId], session):
+        await db["assignments"].delete_many({"_id": {"$in": ids}}, session=session)
+
+    # Materials are only flagged; the reclaimer deletes their files (unless shared) and the rows
+    async def purge_materials(ids: List[ObjectId], session):
+        await db["materials"].update_many({"_id": {"$in": ids}}, {"$set": {"archived": True, "purge": True}}, session=session)
+        await db[MATERIAL_TEXT].update_many({"_id": {"$in": ids}}, {"$set": {"archived": True}}, session=session)
+
+    async def delete_notifications(ids: List[ObjectId], session):
+        await db["notification_history"].delete_many({"_id": {"$in": ids}}, session=session)
+
+    await _in_batches(db, job_id, "assignments", "assignments", {"course_id": course_id}, delete_assignments)
+    await _in_batches(db, job_id, "materials", "materials",
+                      {"course_id": course_id, "purge": {"$ne": True}}, purge_materials)
+    await _in_batches(db, job_id, "notifications", "notification_history", {"course_id": course_id}, delete_notifications)
+    await db["email_outbox"].update_many(
+        {"course_id": course_id, "status": "pending"}, {"$set": {"status": "cancelled"}}
+    )
+
+    # The course (with its embedded students and teachers) goes last, so a failed job can be retried
+    async def delete_course(session):
+        await db["courses"].delete_one({"_id": course_id}, session=session)
+        await db["course_summaries"].delete_one({"_id": course_id}, session=session)
+
+    await run_in_transaction(db, delete_course)
+
+
+async def run_course_job(db, job: dict) -> str:
+    """Cascades the course's current state (archived, restored or deleting) to its data; returns what was done."""
+    if job["action"] == "clone":
+        cloned = await clone_courses(db, job)
+        return f"cloned {cloned} courses"
+
+    course_id = job["course_id"]
+    course = await db["courses"].find_one({"_id": course_id}, {"archived": 1, "deleting": 1})
+    if course is None or course.get("deleting"):
+        await _delete(db, job["_id"], course_id)
+        applied = "delete"
+    elif course.get("archived"):
+        await _archive(db, job["_id"], course_id)
+        applied = "archive"
+    else:
+        await _restore(db, job["_id"], course_id)
+        applied = "restore"
+    # Assignment and material counts changed with the cascade
+    await refresh_summaries(db, [course_id])
+    await invalidate_course(course_id)
+    return applied
+
+
+async def claim_course_job(db) -> Optional[dict]:
+    """Claims the oldest pending job, or a running one whose worker stopped reporting progress."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.COURSE_JOB_TIMEOUT)
+    return await db[COLLECTION].find_one_and_update(
+        {"$or": [{"status": "pending"}, {"status": "running", "heartbeat_at": {"$lt": stale}}]},
+        {"$set": {"status": "running", "started_at": now, "heartbeat_at": now}},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def run_course_job_worker(db) -> None:
+    """Processes queued course jobs; every worker may claim jobs, each job is claimed by one."""
+    while True:
+        try:
+            while (job := await claim_course_job(db)) is not None:
+                try:
+                    applied = await run_course_job(db, job)
+                    await db[COLLECTION].update_one(
+                        {"_id": job["_id"]},
+                        {"$set": {"status": "done", "applied": applied, "finished_at": datetime.utcnow()}},
+                    )
+                    print(f"Course job {job['_id']} ({applied}) finished")
+                except Exception as e:
+                    await db[COLLECTION].update_one(
+                        {"_id": job["_id"]},
+                        {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}},
+                    )
+                    print(f"Course job {job['_id']} ({job['action']}) failed: {e}")
+        except Exception as e:
+            print(f"Course job worker failed: {e}")
+        await asyncio.sleep(settings.COURSE_JOB_POLL_INTERVAL)
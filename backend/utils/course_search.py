@@ -0,0 +1,158 @@
+import asyncio
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Catalogue search runs against the course_summaries read model (see utils/course_summaries.py)
+COLLECTION = "course_summaries"
+
+# Values listed per facet, most frequent first
+FACET_LIMIT = 20
+
+
+class InvalidCursor(ValueError):
+    """The pagination cursor is malformed or belongs to a different sort order."""
+
+
+def encode_cursor(kind: str, key, last_id: ObjectId) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps([kind, key, str(last_id)])).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str) -> Tuple[object, ObjectId]:
+    try:
+        cursor_kind, key, last_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if cursor_kind != kind:
+            raise InvalidCursor()
+        if kind == "recent" and key is not None:
+            key = datetime.fromisoformat(key)
+        return key, ObjectId(last_id)
+    except (ValueError, TypeError, InvalidId, orjson.JSONDecodeError) as e:
+        raise InvalidCursor() from e
+
+
+def _user_ids(user_id: str) -> dict:
+    # Embedded user ids are stored as strings, but older documents may hold ObjectIds
+    return {"$in": [user_id, ObjectId(user_id)] if ObjectId.is_valid(user_id) else [user_id]}
+
+
+def _filters(owner: Optional[str], teacher: Optional[str], archived: Optional[bool], skip: str = None) -> dict:
+    """The filter conditions, leaving out `skip` so a facet counts the values its own filter would select."""
+    match = {}
+    if owner and skip != "owner":
+        match["owner._id"] = _user_ids(owner)
+    if teacher and skip != "teacher":
+        match["teachers._id"] = _user_ids(teacher)
+    if archived is not None and skip != "archived":
+        match["archived"] = archived
+    return match
+
+
+def _after_recent(created_at: Optional[datetime], last_id: ObjectId) -> dict:
+    # Newest first; courses without created_at sort last (nulls are lowest)
+    if created_at is None:
+        return {"created_at": None, "_id": {"$lt": last_id}}
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": last_id}},
+        {"created_at": None},
+    ]}
+
+
+async def _page(db, query: Optional[str], match: dict, cursor: Optional[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """
+    Returns one page of courses and the cursor of the next page.
+
+    Without a query, courses are listed newest first and the cursor resumes after the last
+    (created_at, _id) pair, so every page is a bounded walk of the (archived, created_at, _id)
+    index. With a query, courses are ranked by text score and the cursor carries (score, _id).
+    """
+    if query:
+        pipeline = [
+            {"$match": {"$text": {"$search": query}, **match}},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+        ]
+        if cursor:
+            score, last_id = decode_cursor(cursor, "text")
+            pipeline.append({"$match": {"$or": [{"score": {"$lt": score}}, {"score": score, "_id": {"$lt": last_id}}]}})
+        pipeline += [{"$sort": {"score": -1, "_id": -1}}, {"$limit": limit + 1}, {"$project": {"updated_at": 0}}]
+        courses = await db[COLLECTION].aggregate(pipeline).to_list(length=None)
+    else:
+        if cursor:
+            match = {"$and": [match, _after_recent(*decode_cursor(cursor, "recent"))]}
+        courses = await db[COLLECTION].find(match, {"updated_at": 0}).sort(
+            [("created_at", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(length=None)
+
+    # The extra row only tells whether there is a next page
+    next_cursor = None
+    if len(courses) > limit:
+        courses = courses[:limit]
+        last = courses[-1]
+        next_cursor = (
+            encode_cursor("text", last["score"], last["_id"]) if query
+            else encode_cursor("recent", last.get("created_at"), last["_id"])
+        )
+    return courses, next_cursor
+
+
+async def _facets(db, query: Optional[str], owner: Optional[str], teacher: Optional[str], archived: Optional[bool]) -> dict:
+    """Counts courses per owner, teacher and archived state, and the total, in one $facet aggregation."""
+    base = [{"$match": {"$text": {"$search": query}}}] if query else []
+
+    def counts(skip: str, group: list) -> list:
+        return [{"$match": _filters(owner, teacher, archived, skip)}, *group,
+                {"$sort": {"count": -1, "_id.name": 1}}, {"$limit": FACET_LIMIT}]
+
+    result = await db[COLLECTION].aggregate(base + [{"$facet": {
+        "owners": counts("owner", [
+            {"$group": {"_id": {"id": {"$toString": "$owner._id"}, "name": "$owner.name"}, "count": {"$sum": 1}}},
+        ]),
+        "teachers": counts("teacher", [
+            {"$unwind": "$teachers"},
+            {"$group": {"_id": {"id": {"$toString": "$teachers._id"}, "name": "$teachers.name"}, "count": {"$sum": 1}}},
+        ]),
+        "archived": counts("archived", [{"$group": {"_id": "$archived", "count": {"$sum": 1}}}]),
+        "total": [{"$match": _filters(owner, teacher, archived)}, {"$count": "count"}],
+    }}]).to_list(length=1)
+    facets = result[0] if result else {"owners": [], "teachers": [], "archived": [], "total": []}
+
+    return {
+        "owners": [{"id": row["_id"]["id"], "name": row["_id"].get("name"), "count": row["count"]} for row in facets["owners"]],
+        "teachers": [{"id": row["_id"]["id"], "name": row["_id"].get("name"), "count": row["count"]} for row in facets["teachers"]],
+        "archived": [{"value": bool(row["_id"]), "count": row["count"]} for row in facets["archived"]],
+        "total": facets["total"][0]["count"] if facets["total"] else 0,
+    }
+
+
+async def search_courses(
+    db,
+    query: Optional[str] = None,
+    owner: Optional[str] = None,
+    teacher: Optional[str] = None,
+    archived: Optional[bool] = False,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+) -> dict:
+    """
+    Searches the course catalogue by name and description, filtered by owner, teacher and archived state.
+
+    Facets (and the total) describe the whole result set, so they are computed for the first page
+    only, concurrently with it; following pages pass the cursor and only fetch courses.
+    """
+    match = _filters(owner, teacher, archived)
+    if cursor:
+        courses, next_cursor = await _page(db, query, match, cursor, limit)
+        facets = None
+    else:
+        (courses, next_cursor), facets = await asyncio.gather(
+            _page(db, query, match, None, limit),
+            _facets(db, query, owner, teacher, archived),
+        )
+
+    for course in courses:
+        course["id"] = str(course.pop("_id"))
+        course.pop("score", None)
+    return {"courses": courses, "nextCursor": next_cursor, "facets": facets}
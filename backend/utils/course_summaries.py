@@ -0,0 +1,225 @@
+import asyncio
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+from config import settings
+from utils.scheduler import acquire_leader_lock
+
+# Collections whose changes affect a course summary
+WATCHED_COLLECTIONS = ["courses", "assignments", "materials"]
+
+# "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+# The stored resume token has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+COURSE_FIELDS = {
+    "name": 1,
+    "description": 1,
+    "owner": 1,
+    "teachers": 1,
+    "students._id": 1,
+    "archived": 1,
+    "created_at": 1,
+}
+
+
+async def _count_by_course(collection, match: dict) -> dict:
+    rows = await collection.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$course_id", "count": {"$sum": 1}}},
+    ]).to_list(length=None)
+    return {row["_id"]: row["count"] for row in rows}
+
+
+async def build_summaries(db, courses: List[dict]) -> List[dict]:
+    """
+    Builds the summaries of the given course documents (read with COURSE_FIELDS).
+
+    A summary is everything a course card shows: owner, teachers, enrolled student ids and
+    the assignment and live material counts.
+    """
+    ids = [course["_id"] for course in courses]
+    assignment_counts = await _count_by_course(db["assignments"], {"course_id": {"$in": ids}, "archived": {"$ne": True}})
+    material_counts = await _count_by_course(db["materials"], {"course_id": {"$in": ids}, "archived": False})
+
+    summaries = []
+    for course in courses:
+        students = course.get("students", [])
+        summaries.append({
+            "_id": course["_id"],
+            "name": course["name"],
+            "description": course["description"],
+            "owner": course["owner"],
+            "teachers": course.get("teachers", []),
+            "students": students,
+            "student_count": len(students),
+            "assignment_count": assignment_counts.get(course["_id"], 0),
+            "material_count": material_counts.get(course["_id"], 0),
+            "archived": course.get("archived", False),
+            "created_at": course.get("created_at"),
+        })
+    return summaries
+
+
+async def refresh_summaries(db, course_ids: Iterable[ObjectId]) -> int:
+    """
+    Recomputes the `course_summaries` rows for the given courses, removing rows of deleted courses.
+
+    Called by the handlers that change a course, so the catalogue reflects the change at once;
+    the background sync catches everything else. Returns the number of summaries written.
+    """
+    ids = [_as_object_id(course_id) for course_id in course_ids]
+    ids = [course_id for course_id in ids if course_id is not None]
+    if not ids:
+        return 0
+
+    courses = await db["courses"].find({"_id": {"$in": ids}}, COURSE_FIELDS).to_list(length=None)
+    now = datetime.utcnow()
+    operations = [
+        ReplaceOne({"_id": summary["_id"]}, {**summary, "updated_at": now}, upsert=True)
+        for summary in await build_summaries(db, courses)
+    ]
+    if operations:
+        await db["course_summaries"].bulk_write(operations, ordered=False)
+
+    removed = set(ids) - {course["_id"] for course in courses}
+    if removed:
+        await db["course_summaries"].delete_many({"_id": {"$in": list(removed)}})
+    return len(operations)
+
+
+async def rebuild_summaries(db, batch_size: Optional[int] = None) -> int:
+    """Recomputes every course summary in batches and drops summaries of deleted courses."""
+    batch_size = batch_size or settings.COURSE_SUMMARY_BATCH_SIZE
+    started = datetime.utcnow()
+    written = 0
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id else {}
+        batch = await db["courses"].find(query, {"_id": 1}).sort("_id", 1).limit(batch_size).to_list(length=None)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        written += await refresh_summaries(db, [doc["_id"] for doc in batch])
+
+    # Anything not rewritten by this pass belongs to a course that no longer exists
+    await db["course_summaries"].delete_many({"updated_at": {"$lt": started}})
+    return written
+
+
+def _as_object_id(value) -> Optional[ObjectId]:
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value) if ObjectId.is_valid(value) else None
+
+
+def affected_courses(change: dict) -> Optional[Set[ObjectId]]:
+    """Returns the course ids a change event touches, or None when they cannot be determined."""
+    if change["ns"]["coll"] == "courses":
+        return {change["documentKey"]["_id"]}
+
+    # Assignments and materials point at their course; an update may also move them between courses
+    ids = set()
+    for image in ("fullDocument", "fullDocumentBeforeChange"):
+        document = change.get(image)
+        if document and document.get("course_id") is not None:
+            ids.add(_as_object_id(document["course_id"]))
+    ids.discard(None)
+    # A delete without a pre-image (collection not configured for them) says nothing about the course
+    return ids or None
+
+
+async def follow_changes(db) -> None:
+    """
+    Applies course, assignment and material changes to `course_summaries` while this worker holds the lock.
+
+    The resume token is stored after every flushed batch so the next leader continues where
+    this one stopped. Without a stored token the stream is opened first and the collection
+    rebuilt, so no change made during the rebuild is missed.
+    """
+    state = db["course_summary_state"]
+    saved = await state.find_one({"_id": "change_stream"})
+    ttl = settings.COURSE_SUMMARY_LOCK_TTL
+    loop = asyncio.get_running_loop()
+
+    async with db.watch(
+        [{"$match": {"ns.coll": {"$in": WATCHED_COLLECTIONS}}}],
+        full_document="updateLookup",
+        full_document_before_change="whenAvailable",
+        resume_after=saved["resume_token"] if saved else None,
+        max_await_time_ms=1000,
+    ) as stream:
+        if saved is None:
+            rebuilt = await rebuild_summaries(db)
+            await state.update_one(
+                {"_id": "change_stream"}, {"$set": {"resume_token": stream.resume_token}}, upsert=True
+            )
+            print(f"Rebuilt {rebuilt} course summaries")
+
+        pending: Set[ObjectId] = set()
+        rebuild = False
+        flush_at = renew_at = loop.time() + ttl / 2
+        while stream.alive:
+            change = await stream.try_next()
+            if change is not None:
+                courses = affected_courses(change)
+                if courses is None:
+                    rebuild = True
+                else:
+                    if not pending:
+                        flush_at = loop.time() + 1
+                    pending |= courses
+
+            # Flush when the stream goes idle, the batch is full or the oldest change is a second old
+            if (pending or rebuild) and (
+                change is None or len(pending) >= settings.COURSE_SUMMARY_BATCH_SIZE or loop.time() >= flush_at
+            ):
+                if rebuild:
+                    await rebuild_summaries(db)
+                else:
+                    await refresh_summaries(db, pending)
+                pending, rebuild = set(), False
+                await state.update_one(
+                    {"_id": "change_stream"}, {"$set": {"resume_token": stream.resume_token}}, upsert=True
+                )
+
+            if loop.time() >= renew_at:
+                if not await acquire_leader_lock(db, "course_summaries", ttl):
+                    return
+                renew_at = loop.time() + ttl / 2
+
+
+async def run_summary_sync(db) -> None:
+    """
+    Keeps `course_summaries` up to date on whichever worker holds the lock.
+
+    Follows a change stream when the deployment supports them (replica sets and sharded
+    clusters); otherwise rebuilds every COURSE_SUMMARY_REBUILD_INTERVAL seconds.
+    """
+    change_streams = True
+    while True:
+        # A periodic rebuild holds the lock across the interval, like the other background jobs
+        ttl = settings.COURSE_SUMMARY_LOCK_TTL if change_streams else settings.COURSE_SUMMARY_REBUILD_INTERVAL * 2
+        try:
+            if await acquire_leader_lock(db, "course_summaries", ttl):
+                if change_streams:
+                    try:
+                        await follow_changes(db)
+                    except OperationFailure as e:
+                        if e.code == CHANGE_STREAM_HISTORY_LOST:
+                            # Start over from a fresh stream and a full rebuild
+                            await db["course_summary_state"].delete_one({"_id": "change_stream"})
+                        elif e.code == CHANGE_STREAMS_UNSUPPORTED:
+                            print("Change streams unavailable; rebuilding course summaries periodically")
+                            change_streams = False
+                        else:
+                            raise
+                if not change_streams:
+                    await rebuild_summaries(db)
+        except Exception as e:
+            print(f"Course summary sync failed: {e}")
+        # Followers retry for the lock well within its TTL so a dead leader is replaced quickly
+        await asyncio.sleep(settings.COURSE_SUMMARY_LOCK_TTL / 2 if change_streams else settings.COURSE_SUMMARY_REBUILD_INTERVAL)
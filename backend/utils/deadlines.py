@@ -0,0 +1,68 @@
+import asyncio
+import time
+from typing import Optional
+import pymongo
+from fastapi import HTTPException, Request, status
+from pymongo.errors import PyMongoError
+from config import settings
+from utils.metrics import metrics
+
+metrics.register("request_budget_seconds", "gauge", "Time budget configured for the route (0 = none)")
+metrics.register("requests_total", "counter", "Requests that ran under a deadline")
+metrics.register("request_timeouts_total", "counter", "Requests cancelled for exceeding their budget")
+metrics.register("request_seconds_sum", "counter", "Total time spent by requests under a deadline")
+metrics.register("request_seconds_max", "gauge", "Slowest request under a deadline")
+
+
+def route_budget(name: Optional[str]) -> float:
+    """Seconds allowed for the named route; ROUTE_TIMEOUTS overrides REQUEST_TIMEOUT, 0 means no deadline."""
+    return settings.ROUTE_TIMEOUTS.get(name, settings.REQUEST_TIMEOUT)
+
+
+def timeout_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail={
+            "error_code": "GEN_504_GATEWAY_TIMEOUT",
+            "message": settings.GENERAL_ERRORS["GEN_504_GATEWAY_TIMEOUT"],
+        },
+    )
+
+
+async def request_deadline(request: Request):
+    """
+    App-wide dependency bounding each request by its route's time budget.
+
+    pymongo.timeout() stores the deadline in a contextvar that Motor copies into its executor
+    threads, so every database call made for the request (including pool checkout and server
+    selection) gets the remaining budget as maxTimeMS and socket timeout. asyncio.timeout()
+    cancels the handler itself once the budget is spent, wherever it is waiting. Either way
+    the client gets GEN_504. Streaming bodies are sent after the handler returns and are not
+    bounded. asyncio.timeout() needs Python 3.11; the README requires 3.12.
+    """
+    route = request.scope.get("route")
+    name = getattr(route, "name", None) or "unmatched"
+    budget = route_budget(name)
+    metrics.set("request_budget_seconds", name, budget)
+    if not budget:
+        yield
+        return
+
+    started = time.monotonic()
+    try:
+        with pymongo.timeout(budget):
+            async with asyncio.timeout(budget):
+                yield
+    except TimeoutError:
+        metrics.inc("request_timeouts_total", name)
+        raise timeout_error()
+    except PyMongoError as e:
+        if not e.timeout:
+            raise
+        metrics.inc("request_timeouts_total", name)
+        raise timeout_error() from e
+    finally:
+        elapsed = time.monotonic() - started
+        metrics.inc("requests_total", name)
+        metrics.inc("request_seconds_sum", name, elapsed)
+        metrics.set_max("request_seconds_max", name, elapsed)
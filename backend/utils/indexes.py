@@ -0,0 +1,92 @@
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+# Indexes backing the application's query patterns, created at startup before traffic is accepted
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)]),
+        IndexModel([("email", ASCENDING)]),
+    ],
+    "courses": [
+        IndexModel([("archived", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("students._id", ASCENDING)]),
+        # Denormalized user copies, located when a username changes
+        IndexModel([("owner._id", ASCENDING)]),
+        IndexModel([("teachers._id", ASCENDING)]),
+    ],
+    "course_summaries": [
+        IndexModel([("archived", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("owner._id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("teachers._id", ASCENDING), ("created_at", DESCENDING)]),
+        # Catalogue search; a name match outranks a description match
+        IndexModel([("name", TEXT), ("description", TEXT)], weights={"name": 5, "description": 1}, name="course_search"),
+        IndexModel([("updated_at", ASCENDING)]),
+    ],
+    "assignments": [
+        IndexModel([("course_id", ASCENDING), ("deadline", ASCENDING)]),
+        IndexModel([("deadline", ASCENDING)]),
+        IndexModel([("teacher._id", ASCENDING)]),
+        IndexModel([("students_completed.student_id", ASCENDING)]),
+    ],
+    "materials": [
+        IndexModel([("course_id", ASCENDING)]),
+        # Live materials per course; archived ones are left out of the index entirely
+        IndexModel(
+            [("course_id", ASCENDING), ("uploaded_at", ASCENDING)],
+            name="live_materials_by_course",
+            partialFilterExpression={"archived": False},
+        ),
+        IndexModel(
+            [("archived_at", ASCENDING)],
+            name="archived_materials",
+            partialFilterExpression={"archived": True},
+        ),
+    ],
+    "material_text": [
+        # Course-scoped full-text search; a title match outranks a description match, which outranks the body
+        IndexModel(
+            [("course_id", ASCENDING), ("title", TEXT), ("description", TEXT), ("body", TEXT)],
+            weights={"title": 10, "description": 5, "body": 1},
+            name="material_text_search",
+        ),
+        IndexModel([("status", ASCENDING), ("queued_at", ASCENDING)]),
+    ],
+    "upload_sessions": [
+        IndexModel([("expires_at", ASCENDING)]),
+    ],
+    "upload_chunks": [
+        IndexModel([("session_id", ASCENDING), ("offset", ASCENDING)], unique=True),
+    ],
+    "notification_history": [
+        IndexModel([("recipient_email", ASCENDING), ("is_read", ASCENDING)]),
+        IndexModel([("course_id", ASCENDING)], sparse=True),
+        IndexModel([("reminder_id", ASCENDING)], unique=True, sparse=True),
+    ],
+    "email_history": [
+        IndexModel([("recipient", ASCENDING)]),
+    ],
+    "reminders": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "email_outbox": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("course_id", ASCENDING), ("status", ASCENDING)], sparse=True),
+    ],
+    "course_jobs": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("course_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "rename_jobs": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "refresh_tokens": [
+        IndexModel([("token", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+async def ensure_indexes(db) -> None:
+    """Creates any missing indexes; existing ones are left untouched."""
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
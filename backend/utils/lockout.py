@@ -0,0 +1,224 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Set
+from pymongo import ReturnDocument, UpdateOne
+from config import settings
+
+COLLECTION = "login_failures"
+
+
+class LoginFailureTracker:
+    """
+    Sliding-window count of failed logins per identifier, with lockouts shared through MongoDB.
+
+    The `login_failures` collection is the source of truth: one document per identifier with
+    its recent failure times (merged from every worker with $push) and `locked_until`. Each
+    worker keeps a copy of the active locks, refreshed every LOGIN_FAILURE_PERSIST_INTERVAL
+    seconds, so lockout checks never touch MongoDB; a lock set by one worker, or cleared by
+    an admin, reaches the others within that interval.
+
+    A worker locks an identifier on its own once it has seen LOGIN_MAX_FAILURES failures in the
+    window, writing the lock through at once; failures spread across workers are merged on
+    the next sync and lock the identifier there. Identifiers whose window has passed are
+    pruned, and at most `max_tracked` are kept in memory (oldest dropped first), so failed
+    logins for made-up names (password spraying) cannot grow memory without bound.
+    """
+
+    def __init__(self, max_failures: int, window: int, lockout_duration: int, max_tracked: int):
+        self.max_failures = max_failures
+        self.window = window
+        self.lockout_duration = lockout_duration
+        self.max_tracked = max_tracked
+        self._failures: Dict[str, Deque[float]] = {}
+        self._locked_until: Dict[str, float] = {}
+        # Failure times not yet merged into MongoDB, and identifiers whose failures a login reset
+        self._pending: Dict[str, List[float]] = {}
+        self._cleared: Set[str] = set()
+        self._synced_at = 0.0
+
+    @staticmethod
+    def normalize(identifier: str) -> str:
+        return identifier.strip().lower()
+
+    def locked_for(self, identifier: str) -> Optional[int]:
+        """Returns the seconds left on the identifier's lockout, or None if it is not locked."""
+        key = self.normalize(identifier)
+        until = self._locked_until.get(key)
+        if until is None:
+            return None
+        remaining = until - time.time()
+        if remaining <= 0:
+            self._locked_until.pop(key, None)
+            return None
+        return int(remaining) + 1
+
+    async def record_failure(self, db, identifier: str) -> bool:
+        """Counts a failed attempt and returns True if it locked the identifier."""
+        key = self.normalize(identifier)
+        now = time.time()
+        if key not in self._failures:
+            self._make_room()
+        attempts = self._failures.setdefault(key, deque(maxlen=self.max_failures))
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        attempts.append(now)
+        self._pending.setdefault(key, []).append(now)
+        if len(attempts) < self.max_failures:
+            return False
+
+        # Rare enough to write through, so the other workers see the lock on their next sync
+        until = now + self.lockout_duration
+        self._locked_until[key] = until
+        del self._failures[key]
+        self._pending.pop(key, None)
+        await db[COLLECTION].update_one(
+            {"_id": key},
+            {"$set": {"failures": [], "locked_until": until}, "$max": {"expires_at": datetime.utcfromtimestamp(until)}},
+            upsert=True,
+        )
+        return True
+
+    def _make_room(self) -> None:
+        # Dicts keep insertion order: the first keys are the oldest failures
+        while len(self._failures) >= self.max_tracked:
+            key = next(iter(self._failures))
+            del self._failures[key]
+            self._pending.pop(key, None)
+
+    def prune(self) -> int:
+        """Forgets identifiers whose failures have all left the window; returns how many."""
+        cutoff = time.time() - self.window
+        expired = [key for key, attempts in self._failures.items() if not attempts or attempts[-1] <= cutoff]
+        for key in expired:
+            del self._failures[key]
+        return len(expired)
+
+    def record_success(self, identifier: str) -> None:
+        key = self.normalize(identifier)
+        self._pending.pop(key, None)
+        if self._failures.pop(key, None) is not None:
+            self._cleared.add(key)
+
+    async def unlock(self, db, identifier: str) -> bool:
+        """Clears the identifier's lockout and failures in MongoDB; returns whether it was locked."""
+        key = self.normalize(identifier)
+        now = time.time()
+        before = await db[COLLECTION].find_one_and_update(
+            {"_id": key},
+            # Kept for a window so every worker's next refresh sees the unlock
+            {"$set": {
+                "failures": [], "locked_until": None, "unlocked_at": now,
+                "expires_at": datetime.utcfromtimestamp(now + self.window),
+            }},
+            return_document=ReturnDocument.BEFORE,
+        )
+        self._locked_until.pop(key, None)
+        self._failures.pop(key, None)
+        self._pending.pop(key, None)
+        return bool(before and before.get("locked_until") and before["locked_until"] > now)
+
+    async def locked_identifiers(self, db) -> List[dict]:
+        now = time.time()
+        cursor = db[COLLECTION].find({"locked_until": {"$gt": now}}, {"locked_until": 1}).sort("locked_until", 1)
+        return [
+            {
+                "identifier": doc["_id"],
+                "locked_until": datetime.utcfromtimestamp(doc["locked_until"]),
+                "seconds_remaining": int(doc["locked_until"] - now) + 1,
+            }
+            async for doc in cursor
+        ]
+
+    async def flush(self, db) -> None:
+        """Merges this worker's new failures into MongoDB and locks identifiers that crossed the limit there."""
+        pending = {key: times for key, times in self._pending.items() if times}
+        self._pending = {}
+        cleared, self._cleared = self._cleared, set()
+        operations = [
+            UpdateOne({"_id": key}, {"$set": {"failures": []}}) for key in cleared if key not in pending
+        ]
+        for key, times in pending.items():
+            operations.append(UpdateOne(
+                {"_id": key},
+                {
+                    # Keep the latest max_failures times, in order, whichever workers recorded them
+                    "$push": {"failures": {"$each": times, "$sort": 1, "$slice": -self.max_failures}},
+                    "$max": {"expires_at": datetime.utcfromtimestamp(max(times) + self.window)},
+                },
+                upsert=True,
+            ))
+        if not operations:
+            return
+        try:
+            await db[COLLECTION].bulk_write(operations, ordered=False)
+        except Exception:
+            for key, times in pending.items():
+                self._pending.setdefault(key, []).extend(times)
+            self._cleared |= cleared
+            raise
+        if not pending:
+            return
+
+        # Identifiers whose merged failures now hold max_failures times, all within the window
+        now = time.time()
+        until = now + self.lockout_duration
+        await db[COLLECTION].update_many(
+            {
+                "_id": {"$in": list(pending)},
+                f"failures.{self.max_failures - 1}": {"$exists": True},
+                "failures.0": {"$gt": now - self.window},
+                "$or": [{"locked_until": None}, {"locked_until": {"$lte": now}}],
+            },
+            {"$set": {"failures": [], "locked_until": until}, "$max": {"expires_at": datetime.utcfromtimestamp(until)}},
+        )
+        locked = db[COLLECTION].find({"_id": {"$in": list(pending)}, "locked_until": {"$gt": now}}, {"locked_until": 1})
+        async for doc in locked:
+            self._locked_until[doc["_id"]] = doc["locked_until"]
+            self._failures.pop(doc["_id"], None)
+
+    async def refresh(self, db) -> None:
+        """Replaces the local copy of active locks with MongoDB's and drops failures an admin cleared."""
+        now = time.time()
+        cursor = db[COLLECTION].find(
+            {"$or": [{"locked_until": {"$gt": now}}, {"unlocked_at": {"$gte": self._synced_at}}]},
+            {"locked_until": 1, "unlocked_at": 1},
+        ).sort("locked_until", -1).limit(self.max_tracked)
+        locked = {}
+        async for doc in cursor:
+            if doc.get("locked_until") and doc["locked_until"] > now:
+                locked[doc["_id"]] = doc["locked_until"]
+            elif doc.get("unlocked_at"):
+                # Failures this worker saw before the unlock no longer count
+                unlocked_at = doc["unlocked_at"]
+                if doc["_id"] in self._failures:
+                    self._failures[doc["_id"]] = deque(
+                        (t for t in self._failures[doc["_id"]] if t > unlocked_at), maxlen=self.max_failures
+                    )
+                if doc["_id"] in self._pending:
+                    self._pending[doc["_id"]] = [t for t in self._pending[doc["_id"]] if t > unlocked_at]
+        self._locked_until = locked
+        self._synced_at = now
+
+    async def load(self, db) -> None:
+        await db[COLLECTION].create_index("expires_at", expireAfterSeconds=0)
+        await self.refresh(db)
+
+    async def run_persistence(self, db) -> None:
+        while True:
+            await asyncio.sleep(settings.LOGIN_FAILURE_PERSIST_INTERVAL)
+            self.prune()
+            try:
+                await self.refresh(db)
+                await self.flush(db)
+            except Exception as e:
+                print(f"Failed to sync login failures: {e}")
+
+
+login_failures = LoginFailureTracker(
+    max_failures=settings.LOGIN_MAX_FAILURES,
+    window=settings.LOGIN_FAILURE_WINDOW,
+    lockout_duration=settings.LOGIN_LOCKOUT_DURATION,
+    max_tracked=settings.LOGIN_FAILURE_MAX_TRACKED,
+)
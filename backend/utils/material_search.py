@@ -0,0 +1,160 @@
+import asyncio
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional
+from pymongo import ReturnDocument
+from config import settings
+from utils.storage import LocalStorage, display_name, material_location
+from utils.text_extraction import document_kind, extract_text
+
+# One row per material: its searchable text and its extraction state ("pending", "processing", "indexed")
+COLLECTION = "material_text"
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Returns this worker's extraction process pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.EXTRACTION_WORKERS)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def enqueue_material(db, material: dict) -> None:
+    """Queues a material for text extraction; only an insert, so uploads never wait on indexing."""
+    await db[COLLECTION].update_one(
+        {"_id": material["_id"]},
+        {"$set": {
+            "course_id": material["course_id"],
+            "title": material["title"],
+            "description": material.get("description") or "",
+            "archived": material.get("archived", False),
+            "status": "pending",
+            "queued_at": datetime.utcnow(),
+        }, "$setOnInsert": {"body": ""}},
+        upsert=True,
+    )
+
+
+async def update_material_fields(db, material_id, **fields) -> None:
+    """Mirrors title/description edits and archive/restore onto the search row."""
+    await db[COLLECTION].update_one({"_id": material_id}, {"$set": fields})
+
+
+async def _local_copy(storage, key: str) -> str:
+    # Extraction needs a file path; objects in S3 or GridFS are streamed to a temp file first
+    fd, path = tempfile.mkstemp(prefix="extract-")
+    f = os.fdopen(fd, "wb")
+    try:
+        async for chunk in storage.open(key):
+            await asyncio.to_thread(f.write, chunk)
+    finally:
+        await asyncio.to_thread(f.close)
+    return path
+
+
+async def index_material(db, material: dict) -> str:
+    """Extracts the material's text in the process pool; returns the (capped) text."""
+    storage, key = material_location(material)
+    kind = document_kind(display_name(key), material.get("file_type"))
+    if kind is None or material.get("file_size", 0) > settings.EXTRACTION_MAX_FILE_SIZE:
+        return ""
+
+    local = isinstance(storage, LocalStorage)
+    path = storage.path(key) if local else await _local_copy(storage, key)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_pool(), extract_text, path, kind, settings.EXTRACTION_MAX_CHARS)
+    finally:
+        if not local:
+            await asyncio.to_thread(os.remove, path)
+
+
+async def claim_extraction(db) -> Optional[dict]:
+    """Claims the oldest pending row, or one whose worker stopped before finishing."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.EXTRACTION_TIMEOUT)
+    return await db[COLLECTION].find_one_and_update(
+        {"$or": [{"status": "pending"}, {"status": "processing", "claimed_at": {"$lt": stale}}]},
+        {"$set": {"status": "processing", "claimed_at": now}},
+        sort=[("queued_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def run_extraction_worker(db) -> None:
+    """Extracts queued materials one at a time per app worker; the CPU work runs in the process pool."""
+    while True:
+        try:
+            while (row := await claim_extraction(db)) is not None:
+                material = await db["materials"].find_one({"_id": row["_id"]})
+                if material is None:
+                    await db[COLLECTION].delete_one({"_id": row["_id"]})
+                    continue
+                try:
+                    body = await index_material(db, material)
+                    status = {"status": "indexed", "body": body, "indexed_at": datetime.utcnow()}
+                except Exception as e:
+                    # Unreadable files stay searchable by title and description
+                    print(f"Text extraction failed for material {row['_id']}: {e}")
+                    status = {"status": "failed", "error": str(e), "indexed_at": datetime.utcnow()}
+                # A re-upload or edit while we worked re-queued the row; leave it pending
+                await db[COLLECTION].update_one(
+                    {"_id": row["_id"], "status": "processing", "claimed_at": row["claimed_at"]}, {"$set": status}
+                )
+        except Exception as e:
+            print(f"Extraction worker failed: {e}")
+        await asyncio.sleep(settings.EXTRACTION_POLL_INTERVAL)
+
+
+def make_snippet(text: str, terms: List[str], width: int = 160) -> str:
+    """Returns about `width` characters of `text` around the first query term, with the term in **bold**."""
+    if not text:
+        return ""
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE) if terms else None
+    match = pattern.search(text) if pattern else None
+    if match is None:
+        return text[:width] + ("…" if len(text) > width else "")
+    start = max(match.start() - width // 2, 0)
+    end = min(start + width, len(text))
+    snippet = pattern.sub(lambda m: f"**{m.group()}**", text[start:end])
+    return ("…" if start else "") + snippet + ("…" if end < len(text) else "")
+
+
+def best_snippet(row: dict, terms: List[str]) -> str:
+    # Prefer the document text, falling back to the description when only it (or the title) matched
+    lowered = [term.lower() for term in terms]
+    for text in (row["body"], row["description"]):
+        if text and any(term in text.lower() for term in lowered):
+            return make_snippet(text, terms)
+    return make_snippet(row["body"] or row["description"], terms)
+
+
+async def search_materials(db, course_id, query: str, limit: int) -> List[dict]:
+    """Ranked text search over a course's live materials, with a snippet per hit."""
+    rows = await db[COLLECTION].find(
+        {"course_id": course_id, "$text": {"$search": query}, "archived": False},
+        {"score": {"$meta": "textScore"}, "title": 1, "description": 1, "body": 1},
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit).to_list(length=limit)
+
+    terms = [term for term in re.findall(r"\w+", query) if len(term) > 1]
+    return [
+        {
+            "material_id": str(row["_id"]),
+            "title": row["title"],
+            "score": round(row["score"], 3),
+            "snippet": best_snippet(row, terms),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,48 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# name -> (type, help text); samples are kept per route
+METRICS: Dict[str, Tuple[str, str]] = {}
+
+
+class RouteMetrics:
+    """
+    Counters and gauges per route, held in this worker process.
+
+    Cheap enough to update on every request (a dict update, no locks: the event loop is
+    single-threaded). With several workers each one reports its own share, as with the
+    in-process rate limiter.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def register(self, name: str, kind: str, help_text: str) -> None:
+        METRICS[name] = (kind, help_text)
+
+    def inc(self, name: str, route: str, value: float = 1) -> None:
+        self._values[name][route] += value
+
+    def set(self, name: str, route: str, value: float) -> None:
+        self._values[name][route] = value
+
+    def set_max(self, name: str, route: str, value: float) -> None:
+        if value > self._values[name][route]:
+            self._values[name][route] = value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {name: dict(samples) for name, samples in self._values.items()}
+
+    def render_prometheus(self) -> str:
+        """Renders the current values in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for name, samples in sorted(self._values.items()):
+            kind, help_text = METRICS.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for route, value in sorted(samples.items()):
+                lines.append(f'{name}{{route="{route}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = RouteMetrics()
@@ -1,7 +1,6 @@
 from datetime import datetime
 from fastapi import HTTPException
 from models.notifications import NotificationSchema, NotificationHistoryModel
-from routers.auth import get_db
 from models.common import ObjectId
 
 
@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo import ReturnDocument
+from config import settings
+from utils.smtp import deliver_email
+
+
+async def claim_email(db) -> Optional[dict]:
+    """Claims the oldest pending email that is due, or one whose sender stopped before marking it."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.OUTBOX_SEND_TIMEOUT)
+    return await db["email_outbox"].find_one_and_update(
+        {"$or": [
+            # Rows enqueued before retries existed have no next_attempt_at and are due
+            {"status": "pending", "next_attempt_at": {"$not": {"$gt": now}}},
+            {"status": "sending", "claimed_at": {"$lt": stale}},
+        ]},
+        {"$set": {"status": "sending", "claimed_at": now}, "$inc": {"attempts": 1}},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def send_outbox_email(db, email: dict) -> bool:
+    """
+    Sends a claimed email and records the outcome on its outbox row and in email_history.
+
+    A failed send goes back to pending and is retried after OUTBOX_RETRY_DELAY seconds, until
+    OUTBOX_MAX_ATTEMPTS attempts have failed and the row is marked failed. Returns whether it was sent.
+    """
+    now = datetime.utcnow()
+    try:
+        await asyncio.to_thread(deliver_email, email["recipient"], email["subject"], email["body"])
+    except Exception as e:
+        final = email.get("attempts", 1) >= settings.OUTBOX_MAX_ATTEMPTS
+        await db["email_outbox"].update_one(
+            {"_id": email["_id"], "status": "sending"},
+            {"$set": {
+                "status": "failed" if final else "pending",
+                "error_message": str(e),
+                "next_attempt_at": now + timedelta(seconds=settings.OUTBOX_RETRY_DELAY),
+            }},
+        )
+        if final:
+            await db["email_history"].insert_one({
+                "recipient": email["recipient"], "subject": email["subject"], "body": email["body"],
+                "sent_at": now, "status": "failed", "error_message": str(e),
+            })
+        return False
+
+    await db["email_outbox"].update_one(
+        {"_id": email["_id"]}, {"$set": {"status": "sent", "sent_at": now}, "$unset": {"error_message": ""}}
+    )
+    await db["email_history"].insert_one({
+        "recipient": email["recipient"], "subject": email["subject"], "body": email["body"],
+        "sent_at": now, "status": "sent", "error_message": None,
+    })
+    return True
+
+
+async def run_outbox_worker(db) -> None:
+    """Sends queued emails (deadline reminders); every worker may claim emails, each email is claimed by one."""
+    while True:
+        try:
+            while (email := await claim_email(db)) is not None:
+                await send_outbox_email(db, email)
+        except Exception as e:
+            print(f"Email outbox worker failed: {e}")
+        await asyncio.sleep(settings.OUTBOX_POLL_INTERVAL)
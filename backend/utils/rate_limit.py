@@ -0,0 +1,162 @@
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Tuple
+from fastapi import Depends, HTTPException, Request, status
+from config import settings
+from utils.redis_client import get_redis
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass
+class RateLimitRule:
+    capacity: int  # Bucket size, i.e. the allowed burst
+    refill_rate: float  # Tokens added per second
+    key: str  # "ip" or "user"
+
+    @classmethod
+    def parse(cls, spec: Dict[str, str]) -> "RateLimitRule":
+        """Parses a settings entry such as {"rate": "10/minute", "key": "ip"}."""
+        count, _, period = spec["rate"].partition("/")
+        return cls(capacity=int(count), refill_rate=int(count) / PERIODS[period], key=spec.get("key", "user"))
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int  # Seconds until one token is available (0 when allowed)
+    reset: int  # Seconds until the bucket is full again
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(self.reset),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+def _result(rule: RateLimitRule, allowed: bool, tokens: float) -> RateLimitResult:
+    return RateLimitResult(
+        allowed=allowed,
+        limit=rule.capacity,
+        remaining=int(tokens),
+        retry_after=0 if allowed else math.ceil((1 - tokens) / rule.refill_rate),
+        reset=math.ceil((rule.capacity - tokens) / rule.refill_rate),
+    )
+
+
+class MemoryTokenBuckets:
+    """Token buckets held in this process; each worker enforces its own share of the limit."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated_at)
+
+    async def hit(self, key: str, rule: RateLimitRule) -> RateLimitResult:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (rule.capacity, now))
+        tokens = min(rule.capacity, tokens + (now - updated_at) * rule.refill_rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._prune(now, rule)
+        return _result(rule, allowed, tokens)
+
+    def _prune(self, now: float, rule: RateLimitRule) -> None:
+        # Buckets idle long enough to have refilled carry no state worth keeping
+        idle = rule.capacity / rule.refill_rate
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < idle}
+
+
+# Refills and takes a token atomically; returns {allowed, tokens * 1000}
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, math.floor(tokens * 1000)}
+"""
+
+
+class RedisTokenBuckets:
+    """Token buckets in a shared Redis-compatible store, so the limit holds across workers."""
+
+    def __init__(self, client, prefix: str = "lms:ratelimit:"):
+        self.prefix = prefix
+        self._script = client.register_script(_TOKEN_BUCKET_LUA)
+
+    async def hit(self, key: str, rule: RateLimitRule) -> RateLimitResult:
+        allowed, tokens = await self._script(
+            keys=[self.prefix + key], args=[rule.capacity, rule.refill_rate, time.time()]
+        )
+        return _result(rule, bool(allowed), tokens / 1000)
+
+
+_buckets = None
+
+
+def get_buckets():
+    global _buckets
+    if _buckets is None:
+        if settings.RATE_LIMIT_BACKEND == "redis":
+            client = get_redis()
+            if client is None:
+                raise RuntimeError("RATE_LIMIT_BACKEND is 'redis' but REDIS_URL is not set")
+            _buckets = RedisTokenBuckets(client)
+        else:
+            _buckets = MemoryTokenBuckets()
+    return _buckets
+
+
+async def _enforce(request: Request, group: str, rule: RateLimitRule, identity: str) -> None:
+    result = await get_buckets().hit(f"{group}:{rule.key}:{identity}", rule)
+    # Picked up by the rate_limit_headers middleware so they reach every response type
+    request.state.rate_limit_headers = result.headers()
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "error_code": "API_429_TOO_MANY_REQUESTS",
+                "message": settings.API_ERRORS["API_429_TOO_MANY_REQUESTS"],
+            },
+            headers=result.headers(),
+        )
+
+
+def rate_limit(group: str):
+    """
+    Returns a dependency enforcing the token bucket configured for `group` in settings.RATE_LIMITS.
+
+    Buckets are keyed by client IP or by the authenticated user's id, as configured.
+    """
+    rule = RateLimitRule.parse(settings.RATE_LIMITS[group])
+
+    if rule.key == "ip":
+        async def limit_by_ip(request: Request) -> None:
+            await _enforce(request, group, rule, request.client.host if request.client else "unknown")
+        return limit_by_ip
+
+    # Imported here to avoid a circular import with routers.auth, which uses rate_limit itself
+    from routers.auth import get_current_user
+
+    async def limit_by_user(request: Request, current_user=Depends(get_current_user)) -> None:
+        await _enforce(request, group, rule, str(current_user.id))
+    return limit_by_user
@@ -0,0 +1,169 @@
+import base64
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Optional
+import bson
+from fastapi import Request, Response
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from config import settings
+
+READ_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Client-held proof of a user's last write; echoed back so later reads on secondaries wait for it
+TOKEN_COOKIE = "lms_read_token"
+TOKEN_HEADER = "X-Read-Token"
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# None on primary reads; "replica" on reads that may be stale; "causal" when they wait for the client's last write
+read_state: ContextVar[Optional[str]] = ContextVar("read_state", default=None)
+
+# Collection methods given the request's causal session (unless the caller passes its own)
+SESSION_METHODS = {
+    "find", "find_one", "aggregate", "count_documents", "distinct",
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "find_one_and_update", "find_one_and_delete", "bulk_write",
+}
+
+
+def route_read_mode(name: Optional[str]) -> str:
+    """Read preference name for the route; READ_PREFERENCES is keyed by endpoint function name."""
+    return settings.READ_PREFERENCES.get(name, "primary")
+
+
+def replicated(client) -> bool:
+    """Read preferences and causal tokens only mean something on a replica set or sharded cluster."""
+    return client.topology_description.topology_type_name != "Single"
+
+
+def replica_database(app, mode: str):
+    """The app's database with the given read preference; built once per mode and reused."""
+    replicas = app.mongodb_replicas
+    if mode not in replicas:
+        replicas[mode] = app.mongodb.with_options(
+            read_preference=READ_MODES[mode](max_staleness=settings.READ_MAX_STALENESS)
+        )
+    return replicas[mode]
+
+
+def encode_token(session) -> Optional[str]:
+    if session.operation_time is None:
+        return None
+    raw = bson.encode({"t": session.operation_time, "c": session.cluster_time})
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_token(value: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not value:
+        return None
+    try:
+        token = bson.decode(base64.urlsafe_b64decode(value))
+    except Exception:
+        return None
+    if not isinstance(token.get("t"), bson.Timestamp):
+        return None
+    return token
+
+
+def _with_session(method, session):
+    def call(*args, **kwargs):
+        kwargs.setdefault("session", session)
+        return method(*args, **kwargs)
+    return call
+
+
+class SessionCollection:
+    """Collection proxy passing the request's session to every operation."""
+
+    def __init__(self, collection, session):
+        self._collection = collection
+        self._session = session
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._collection, name)
+        if name in SESSION_METHODS:
+            return _with_session(attr, self._session)
+        return attr
+
+
+class SessionDatabase:
+    """Database proxy handing out SessionCollections; the handlers given one run their queries one at a time."""
+
+    def __init__(self, db, session):
+        self._db = db
+        self._session = session
+
+    def __getitem__(self, name: str) -> SessionCollection:
+        return SessionCollection(self._db[name], self._session)
+
+    def __getattr__(self, name: str):
+        if name == "command":
+            return _with_session(self._db.command, self._session)
+        attr = getattr(self._db, name)
+        if isinstance(attr, AsyncIOMotorCollection):
+            return SessionCollection(attr, self._session)
+        return attr
+
+
+@asynccontextmanager
+async def routed_database(request: Request) -> AsyncIterator[Any]:
+    """
+    Yields the database to use for the request, following the route's read preference.
+
+    Routes listed in READ_PREFERENCES may be served by secondaries, which can lag the primary.
+    If the client sent a read token (from its last write, see record_write) the queries run in a
+    causally consistent session advanced to that write, so the secondary waits until it has
+    replicated it: a student sees a course right after enrolling in it. Without a token the
+    reads may be slightly stale, and responses cached from them expire after REPLICA_CACHE_TTL.
+
+    Writes run in a causal session too; its operation time after the handler, which is that of
+    the request's last operation, becomes the read token, with no extra round trip.
+    """
+    client = request.app.mongodb_client
+    if not replicated(client):
+        yield request.app.mongodb
+        return
+
+    if request.method in WRITE_METHODS:
+        async with await client.start_session(causal_consistency=True) as session:
+            yield SessionDatabase(request.app.mongodb, session)
+            request.state.read_token = encode_token(session)
+        return
+
+    route = request.scope.get("route")
+    mode = route_read_mode(getattr(route, "name", None))
+    if mode == "primary":
+        yield request.app.mongodb
+        return
+
+    db = replica_database(request.app, mode)
+    token = decode_token(request.headers.get(TOKEN_HEADER) or request.cookies.get(TOKEN_COOKIE))
+    if token is None:
+        read_state.set("replica")
+        yield db
+        return
+
+    async with await db.client.start_session(causal_consistency=True) as session:
+        session.advance_operation_time(token["t"])
+        if token.get("c"):
+            session.advance_cluster_time(token["c"])
+        read_state.set("causal")
+        yield SessionDatabase(db, session)
+
+
+def record_write(request: Request, response: Response) -> None:
+    """Hands the client the read token of a successful write, as a header and a short-lived cookie."""
+    token = getattr(request.state, "read_token", None)
+    if token is None or response.status_code >= 400:
+        return
+    response.headers[TOKEN_HEADER] = token
+    response.set_cookie(
+        TOKEN_COOKIE, token, max_age=settings.READ_YOUR_WRITES_WINDOW, httponly=True, samesite="lax"
+    )
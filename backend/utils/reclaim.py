@@ -0,0 +1,79 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Tuple
+from config import settings
+from utils.scheduler import acquire_leader_lock
+from utils.storage import material_location
+from utils.material_search import COLLECTION as MATERIAL_TEXT
+
+
+async def backfill_archived_flag(db) -> int:
+    """Sets archived=False on materials uploaded before soft-delete; returns how many were updated."""
+    # Without the flag they would be missed by the partial index and the archived=False queries
+    result = await db["materials"].update_many({"archived": {"$exists": False}}, {"$set": {"archived": False}})
+    return result.modified_count
+
+
+async def sweep_archived_materials(db) -> Tuple[int, int]:
+    """
+    Permanently removes materials archived longer than the retention window, and those of
+    deleted courses (flagged `purge`), in batches.
+
+    Each batch is claimed with a `reclaiming` flag first so a concurrent restore cannot race the
+    deletion. Objects still referenced by another material are kept; the rest are deleted through
+    their storage backend (off the event loop). Returns (materials, bytes).
+    """
+    cutoff = datetime.utcnow() - timedelta(days=settings.MATERIAL_RETENTION_DAYS)
+    total_materials = total_bytes = 0
+    while True:
+        batch = await db["materials"].find(
+            {"archived": True, "$or": [{"archived_at": {"$lt": cutoff}}, {"purge": True}], "reclaiming": {"$ne": True}},
+            {"_id": 1},
+        ).limit(settings.RECLAIM_BATCH_SIZE).to_list(length=None)
+        if not batch:
+            break
+
+        ids = [doc["_id"] for doc in batch]
+        await db["materials"].update_many({"_id": {"$in": ids}, "archived": True}, {"$set": {"reclaiming": True}})
+        claimed = await db["materials"].find(
+            {"_id": {"$in": ids}, "archived": True, "reclaiming": True},
+            {"file_url": 1, "storage_backend": 1, "storage_key": 1},
+        ).to_list(length=None)
+
+        # file_url identifies the stored object across backends; cloned courses share files, so an
+        # object is kept while any row outside this batch (live or still restorable) points at it
+        urls = {doc["file_url"] for doc in claimed}
+        shared = set(await db["materials"].distinct(
+            "file_url", {"file_url": {"$in": list(urls)}, "reclaiming": {"$ne": True}}
+        ))
+
+        keys_by_backend = defaultdict(set)
+        for doc in claimed:
+            if doc["file_url"] not in shared:
+                storage, key = material_location(doc)
+                keys_by_backend[storage].add(key)
+        reclaimed = 0
+        for storage, keys in keys_by_backend.items():
+            reclaimed += await storage.delete_many(keys)
+
+        claimed_ids = [doc["_id"] for doc in claimed]
+        await db["materials"].delete_many({"_id": {"$in": claimed_ids}})
+        await db[MATERIAL_TEXT].delete_many({"_id": {"$in": claimed_ids}})
+        total_materials += len(claimed)
+        total_bytes += reclaimed
+
+    return total_materials, total_bytes
+
+
+async def run_reclaimer(db) -> None:
+    """Sweeps archived materials every RECLAIM_INTERVAL seconds on whichever worker holds the lock."""
+    while True:
+        try:
+            if await acquire_leader_lock(db, "material_reclaimer", settings.RECLAIM_INTERVAL * 2):
+                materials, reclaimed = await sweep_archived_materials(db)
+                if materials:
+                    print(f"Reclaimed {materials} archived materials ({reclaimed} bytes)")
+        except Exception as e:
+            print(f"Material reclamation failed: {e}")
+        await asyncio.sleep(settings.RECLAIM_INTERVAL)
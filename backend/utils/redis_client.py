@@ -0,0 +1,26 @@
+from config import settings
+
+_client = None
+
+
+def get_redis():
+    """
+    Returns the shared Redis-compatible client, or None when REDIS_URL is not configured.
+
+    The client is created on first use so deployments without Redis never import the driver.
+    """
+    global _client
+    if _client is None and settings.REDIS_URL:
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("REDIS_URL is set but the 'redis' package is not installed") from e
+        _client = redis_asyncio.from_url(settings.REDIS_URL)
+    return _client
+
+
+async def close_redis() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
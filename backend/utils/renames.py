@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from config import settings
+from utils.cache import invalidate_course
+
+# Denormalized copies of a username: (collection, embedded document, id field, name field)
+EMBEDDED_COPIES = [
+    ("courses", "owner", "_id", "name"),
+    ("assignments", "teacher", "_id", "name"),
+]
+
+# (collection, array, id field, name field) for arrays of embedded users
+ARRAY_COPIES = [
+    ("courses", "teachers", "_id", "name"),
+    ("courses", "students", "_id", "name"),
+    ("assignments", "students_completed", "student_id", "student_name"),
+]
+
+
+async def enqueue_rename(db, user_id: str) -> None:
+    """Queues propagation of a user's new username; a pending job for the same user is reused."""
+    now = datetime.utcnow()
+    await db["rename_jobs"].update_one(
+        {"user_id": user_id, "status": "pending"},
+        {"$setOnInsert": {"user_id": user_id, "status": "pending", "progress": {}, "created_at": now}},
+        upsert=True,
+    )
+
+
+async def _course_ids(db, collection: str, ids) -> set:
+    # Courses whose cached responses embed the updated documents
+    if collection == "courses":
+        return set(ids)
+    docs = await db[collection].find({"_id": {"$in": ids}}, {"course_id": 1}).to_list(length=None)
+    return {doc["course_id"] for doc in docs}
+
+
+async def _update_copies(db, job_id, collection: str, path: str, match: dict, update: dict, array_filters=None) -> int:
+    """Updates the matching documents in batches of RENAME_BATCH_SIZE, recording progress on the job."""
+    updated = 0
+    while True:
+        # Updated documents stop matching, so each query picks up where the last batch left off
+        batch = await db[collection].find(match, {"_id": 1}).limit(settings.RENAME_BATCH_SIZE).to_list(length=None)
+        if not batch:
+            return updated
+        ids = [doc["_id"] for doc in batch]
+        result = await db[collection].update_many({"_id": {"$in": ids}}, update, array_filters=array_filters)
+        for course_id in await _course_ids(db, collection, ids):
+            await invalidate_course(course_id)
+        updated += result.modified_count
+        await db["rename_jobs"].update_one(
+            {"_id": job_id},
+            {"$set": {f"progress.{collection}.{path}": updated, "heartbeat_at": datetime.utcnow()}},
+        )
+        if result.modified_count == 0:
+            # Nothing changed (e.g. id stored in an unexpected form); stop rather than loop forever
+            return updated
+
+
+async def propagate_username(db, job: dict) -> int:
+    """
+    Rewrites every denormalized copy of the user's name to their current username.
+
+    The name is read when the job runs, so back-to-back renames converge on the latest one.
+    Copies are located through the indexed id fields and rewritten with targeted update_many
+    calls (arrayFilters for arrays). Returns the number of documents updated.
+    """
+    user = await db["users"].find_one({"_id": ObjectId(job["user_id"])}, {"username": 1})
+    if user is None:
+        return 0
+    name = user["username"]
+    # Ids are stored as strings in courses and as ObjectIds in completions
+    ids = {"$in": [job["user_id"], ObjectId(job["user_id"])]}
+
+    total = 0
+    for collection, field, id_field, name_field in EMBEDDED_COPIES:
+        total += await _update_copies(
+            db, job["_id"], collection, field,
+            {f"{field}.{id_field}": ids, f"{field}.{name_field}": {"$ne": name}},
+            {"$set": {f"{field}.{name_field}": name}},
+        )
+    for collection, array, id_field, name_field in ARRAY_COPIES:
+        total += await _update_copies(
+            db, job["_id"], collection, array,
+            {array: {"$elemMatch": {id_field: ids, name_field: {"$ne": name}}}},
+            {"$set": {f"{array}.$[entry].{name_field}": name}},
+            array_filters=[{f"entry.{id_field}": ids}],
+        )
+    return total
+
+
+async def claim_rename_job(db) -> Optional[dict]:
+    """Claims the oldest pending job, or a running one whose worker stopped reporting progress."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.RENAME_JOB_TIMEOUT)
+    return await db["rename_jobs"].find_one_and_update(
+        {"$or": [{"status": "pending"}, {"status": "running", "heartbeat_at": {"$lt": stale}}]},
+        {"$set": {"status": "running", "started_at": now, "heartbeat_at": now}},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def run_rename_worker(db) -> None:
+    """Processes queued rename jobs; every worker may claim jobs, each job is claimed by one."""
+    while True:
+        try:
+            while (job := await claim_rename_job(db)) is not None:
+                try:
+                    updated = await propagate_username(db, job)
+                    await db["rename_jobs"].update_one(
+                        {"_id": job["_id"]},
+                        {"$set": {"status": "done", "updated": updated, "finished_at": datetime.utcnow()}},
+                    )
+                    print(f"Propagated username of user {job['user_id']} to {updated} documents")
+                except Exception as e:
+                    await db["rename_jobs"].update_one(
+                        {"_id": job["_id"]},
+                        {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}},
+                    )
+                    print(f"Username propagation for user {job['user_id']} failed: {e}")
+        except Exception as e:
+            print(f"Rename worker failed: {e}")
+        await asyncio.sleep(settings.RENAME_POLL_INTERVAL)
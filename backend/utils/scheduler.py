@@ -0,0 +1,182 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import List
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from config import settings
+
+# Identifies this worker process as a lock holder
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def acquire_leader_lock(db, name: str, ttl: int) -> bool:
+    """
+    Takes (or renews) a named lock in the `scheduler_locks` collection.
+
+    Only one worker holds a lock at a time; it expires after `ttl` seconds unless renewed,
+    so another worker takes over if the holder dies.
+    """
+    now = datetime.utcnow()
+    try:
+        await db["scheduler_locks"].find_one_and_update(
+            {"_id": name, "$or": [{"expires_at": {"$lt": now}}, {"owner": WORKER_ID}]},
+            {"$set": {"owner": WORKER_ID, "expires_at": now + timedelta(seconds=ttl)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        # The lock document exists and belongs to a live worker
+        return False
+
+
+def _pending_students_pipeline(start: datetime, end: datetime) -> List[dict]:
+    # For each assignment due in [start, end): enrolled students minus those who completed it
+    return [
+        {"$match": {"deadline": {"$gte": start, "$lt": end}}},
+        {"$project": {"title": 1, "deadline": 1, "course_id": 1, "students_completed.student_id": 1}},
+        {"$lookup": {
+            "from": "courses",
+            "localField": "course_id",
+            "foreignField": "_id",
+            "pipeline": [{"$match": {"archived": False}}, {"$project": {"name": 1, "students._id": 1}}],
+            "as": "course",
+        }},
+        {"$unwind": "$course"},
+        {"$project": {
+            "title": 1,
+            "deadline": 1,
+            "course_id": 1,
+            "course_name": "$course.name",
+            "pending": {"$setDifference": [
+                {"$map": {"input": "$course.students", "in": {"$toString": "$$this._id"}}},
+                {"$map": {"input": "$students_completed", "in": {"$toString": "$$this.student_id"}}},
+            ]},
+        }},
+        {"$unwind": "$pending"},
+        {"$lookup": {
+            "from": "users",
+            "let": {"student_id": {"$toObjectId": "$pending"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$student_id"]}}},
+                {"$project": {"email": 1}},
+            ],
+            "as": "student",
+        }},
+        {"$unwind": "$student"},
+    ]
+
+
+async def enqueue_reminders(db, rows: List[dict], window: int) -> int:
+    """
+    Records one reminder per (assignment, student, window) and delivers its notification and email.
+
+    The reminder's _id is that triple. Its row is inserted undelivered and only marked delivered
+    once the notification and the outbox email are written, so a scan interrupted in between
+    retries them on the next run. Both are upserted on the reminder id, so a retry never
+    duplicates them, and reminders already delivered are skipped.
+    """
+    if not rows:
+        return 0
+
+    by_id = {f"{row['_id']}:{row['pending']}:{window}": row for row in rows}
+    operations = [
+        UpdateOne(
+            {"_id": reminder_id},
+            {"$setOnInsert": {
+                "assignment_id": row["_id"],
+                "course_id": row["course_id"],
+                "student_id": row["pending"],
+                "window_hours": window,
+                "delivered": False,
+                "created_at": datetime.utcnow(),
+                "expires_at": row["deadline"] + timedelta(days=1),
+            }},
+            upsert=True,
+        )
+        for reminder_id, row in by_id.items()
+    ]
+    await db["reminders"].bulk_write(operations, ordered=False)
+    undelivered = await db["reminders"].distinct("_id", {"_id": {"$in": list(by_id)}, "delivered": False})
+    if not undelivered:
+        return 0
+
+    now = datetime.utcnow()
+    notifications = []
+    emails = []
+    for reminder_id in undelivered:
+        row = by_id[reminder_id]
+        title = f"Reminder: {row['title']} is due soon"
+        message = f"'{row['title']}' in {row['course_name']} is due at {row['deadline']:%Y-%m-%d %H:%M} UTC."
+        notifications.append(UpdateOne(
+            {"reminder_id": reminder_id},
+            {"$setOnInsert": {
+                "title": title,
+                "message": message,
+                "recipient_email": row["student"]["email"],
+                "sent_at": now,
+                "status": "sent",
+                "is_read": False,
+                "course_id": row["course_id"],
+                "assignment_id": row["_id"],
+            }},
+            upsert=True,
+        ))
+        emails.append(UpdateOne(
+            {"_id": reminder_id},
+            {"$setOnInsert": {
+                "recipient": row["student"]["email"],
+                "subject": title,
+                "body": message,
+                "status": "pending",
+                "created_at": now,
+                "course_id": row["course_id"],
+                "assignment_id": row["_id"],
+            }},
+            upsert=True,
+        ))
+
+    await db["notification_history"].bulk_write(notifications, ordered=False)
+    if settings.REMINDER_SEND_EMAILS:
+        await db["email_outbox"].bulk_write(emails, ordered=False)
+    await db["reminders"].update_many(
+        {"_id": {"$in": undelivered}}, {"$set": {"delivered": True, "delivered_at": now}}
+    )
+    return len(undelivered)
+
+
+async def scan_deadlines(db) -> int:
+    """
+    Scans upcoming deadlines bucket by bucket for every reminder window and enqueues reminders.
+
+    Each window covers the deadlines between the next smaller window and itself, e.g. with
+    [24, 1] the 1h reminder covers [now, now+1h) and the 24h one [now+1h, now+24h): a
+    deadline an hour away gets the 1h reminder only, not a late 24h one as well.
+    """
+    now = datetime.utcnow()
+    bucket = timedelta(minutes=settings.REMINDER_BUCKET_MINUTES)
+    enqueued = 0
+    smaller = 0
+    for window in sorted(settings.REMINDER_WINDOWS_HOURS):
+        start, end = now + timedelta(hours=smaller), now + timedelta(hours=window)
+        smaller = window
+        while start < end:
+            stop = min(start + bucket, end)
+            rows = await db["assignments"].aggregate(_pending_students_pipeline(start, stop)).to_list(length=None)
+            enqueued += await enqueue_reminders(db, rows, window)
+            start = stop
+    return enqueued
+
+
+async def run_scheduler(db) -> None:
+    """Runs the deadline scan every REMINDER_SCAN_INTERVAL seconds on whichever worker holds the lock."""
+    while True:
+        try:
+            if await acquire_leader_lock(db, "deadline_reminders", settings.REMINDER_SCAN_INTERVAL * 2):
+                enqueued = await scan_deadlines(db)
+                if enqueued:
+                    print(f"Enqueued {enqueued} deadline reminders")
+        except Exception as e:
+            print(f"Deadline reminder scan failed: {e}")
+        await asyncio.sleep(settings.REMINDER_SCAN_INTERVAL)
@@ -0,0 +1,49 @@
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+from typing import Any, Dict, Type
+
+
+def _default(obj: Any) -> Any:
+    # orjson handles datetime natively; only BSON and Pydantic types need help
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", by_alias=True)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serializes Mongo documents (ObjectId, datetime) and Pydantic models straight to JSON bytes."""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson and aware of BSON types."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_projection(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Builds a Mongo projection covering exactly the fields the model serializes.
+
+    Trusted DB reads use it so raw documents have the same keys as the model output
+    without being validated. Fields with a default are filled with it ($ifNull) when the
+    stored document predates them, as validation would; fields whose default is generated
+    (ids, timestamps) are projected as stored.
+    """
+    projection: Dict[str, Any] = {}
+    for name, field in model.model_fields.items():
+        key = field.alias or name
+        if field.default is not PydanticUndefined:
+            projection[key] = {"$ifNull": [f"${key}", {"$literal": field.default}]}
+        elif field.default_factory in (list, dict):
+            projection[key] = {"$ifNull": [f"${key}", field.default_factory()]}
+        else:
+            projection[key] = 1
+    projection.setdefault("_id", 0)
+    return projection
@@ -8,29 +8,33 @@ from typing import Dict
 from datetime import datetime
 from bson import ObjectId
 from fastapi.responses import JSONResponse
-from routers.auth import get_db
+
+
+def deliver_email(recipient: str, subject: str, body: str) -> None:
+    """Sends one plain-text email; blocking, so async callers run it in a thread."""
+    # SMTP server details (example: Gmail)
+    smtp_host = "smtp.gmail.com"
+    smtp_port = 587
+    sender_email = "your-email@gmail.com"  # Your email address
+    sender_password = "your-email-password"  # Your email password (use environment variables or secrets for security)
+
+    # Create the MIME message
+    msg = MIMEMultipart()
+    msg["From"] = sender_email
+    msg["To"] = recipient
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "plain"))
+
+    # Set up the SMTP connection and send the email
+    with smtplib.SMTP(smtp_host, smtp_port) as server:
+        server.starttls()  # Secure the connection
+        server.login(sender_email, sender_password)
+        server.sendmail(sender_email, recipient, msg.as_string())
 
 
 def send_email_via_smtp(db, email: EmailSchema):
     try:
-        # SMTP server details (example: Gmail)
-        smtp_host = "smtp.gmail.com"
-        smtp_port = 587
-        sender_email = "your-email@gmail.com"  # Your email address
-        sender_password = "your-email-password"  # Your email password (use environment variables or secrets for security)
-
-        # Create the MIME message
-        msg = MIMEMultipart()
-        msg["From"] = sender_email
-        msg["To"] = email.recipient
-        msg["Subject"] = email.subject
-        msg.attach(MIMEText(email.body, "plain"))
-
-        # Set up the SMTP connection and send the email
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()  # Secure the connection
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, email.recipient, msg.as_string())
+        deliver_email(email.recipient, email.subject, email.body)
 
         # Record the email history in the database
         email_history = EmailHistoryModel(
@@ -0,0 +1,324 @@
+import asyncio
+import os
+import re
+import uuid
+from typing import AsyncIterator, Dict, Iterable, Optional
+from fastapi import UploadFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from config import settings
+
+CHUNK_SIZE = 1024 * 1024  # Bytes read from an upload or a stored object at a time
+
+
+async def iter_upload(file: UploadFile, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yields an uploaded file in chunks without reading it into memory."""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def make_storage_key(course_id, filename: str) -> str:
+    # Unique per upload, so two files with the same name never overwrite each other
+    safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(filename or "file")) or "file"
+    return f"{course_id}/{uuid.uuid4().hex}-{safe_name}"
+
+
+def display_name(key: str) -> str:
+    """Recovers the uploaded filename from a storage key."""
+    return re.sub(r"^[0-9a-f]{32}-", "", os.path.basename(key))
+
+
+class LocalStorage:
+    """Stores objects as files under a directory on this node's disk (served by the /materials mount)."""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def url(self, key: str) -> str:
+        return self.path(key)
+
+    async def save(self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> int:
+        path = self.path(key)
+        await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+        size = 0
+        f = await asyncio.to_thread(open, path, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(f.write, chunk)
+                size += len(chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        return size
+
+    async def open(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yields the object's bytes in [start, end] (end inclusive, None for the rest)."""
+        f = await asyncio.to_thread(open, self.path(key), "rb")
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = await asyncio.to_thread(f.read, CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def size(self, key: str) -> int:
+        return await asyncio.to_thread(os.path.getsize, self.path(key))
+
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        def delete(paths):
+            reclaimed = 0
+            for path in paths:
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                reclaimed += size
+            return reclaimed
+        return await asyncio.to_thread(delete, [self.path(key) for key in keys])
+
+    async def presigned_url(self, key: str, filename: str) -> Optional[str]:
+        # Local files are streamed by the API (or the static mount); there is nothing to presign
+        return None
+
+
+class S3Storage:
+    """
+    Stores objects in an S3-compatible bucket (AWS S3, MinIO, ...).
+
+    boto3 is blocking, so every call runs in a worker thread. Uploads use multipart so a
+    large file is never held in memory, and downloads are handed to clients as presigned URLs.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise RuntimeError("The s3 storage backend requires the 'boto3' package") from e
+            self._client = boto3.client(
+                "s3",
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                region_name=settings.S3_REGION,
+                aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            )
+        return self._client
+
+    def url(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+    async def save(self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> int:
+        extra = {"ContentType": content_type} if content_type else {}
+        upload = await asyncio.to_thread(
+            self.client.create_multipart_upload, Bucket=self.bucket, Key=key, **extra
+        )
+        upload_id = upload["UploadId"]
+        parts = []
+        buffer = bytearray()
+        size = 0
+
+        async def flush():
+            part_number = len(parts) + 1
+            response = await asyncio.to_thread(
+                self.client.upload_part,
+                Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=bytes(buffer),
+            )
+            parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+            buffer.clear()
+
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                size += len(chunk)
+                # Every part except the last must be at least 5 MiB
+                if len(buffer) >= settings.S3_MULTIPART_CHUNK_SIZE:
+                    await flush()
+            if buffer or not parts:
+                await flush()
+            await asyncio.to_thread(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await asyncio.to_thread(
+                self.client.abort_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+            raise
+        return size
+
+    async def open(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        extra = {}
+        if start or end is not None:
+            extra["Range"] = f"bytes={start}-{'' if end is None else end}"
+        response = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key, **extra)
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    async def size(self, key: str) -> int:
+        response = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+        return response["ContentLength"]
+
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        keys = list(keys)
+        reclaimed = 0
+        for key in keys:
+            try:
+                reclaimed += await self.size(key)
+            except Exception:
+                continue
+        # DeleteObjects accepts at most 1000 keys per call
+        for i in range(0, len(keys), 1000):
+            await asyncio.to_thread(
+                self.client.delete_objects,
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in keys[i:i + 1000]], "Quiet": True},
+            )
+        return reclaimed
+
+    async def presigned_url(self, key: str, filename: str) -> Optional[str]:
+        return await asyncio.to_thread(
+            self.client.generate_presigned_url,
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ResponseContentDisposition": f'attachment; filename="{filename}"',
+            },
+            ExpiresIn=settings.S3_PRESIGN_EXPIRY,
+        )
+
+
+class GridFSStorage:
+    """
+    Stores objects in MongoDB through GridFS, for deployments without an object store.
+
+    The storage key is used as the GridFS file _id, so it is what the material row records.
+    Reads seek to the requested offset and fetch one chunk at a time.
+    """
+
+    name = "gridfs"
+
+    def __init__(self, db, bucket_name: str):
+        self.bucket_name = bucket_name
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f"{bucket_name}.files"]
+        self.chunks = db[f"{bucket_name}.chunks"]
+
+    def url(self, key: str) -> str:
+        return f"gridfs://{self.bucket_name}/{key}"
+
+    async def save(self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> int:
+        metadata = {"contentType": content_type} if content_type else None
+        grid_in = self.bucket.open_upload_stream_with_id(key, key, metadata=metadata)
+        size = 0
+        try:
+            async for chunk in chunks:
+                await grid_in.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            # Removes the chunks written so far
+            await grid_in.abort()
+            raise
+        await grid_in.close()
+        return size
+
+    async def open(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        grid_out = await self.bucket.open_download_stream(key)
+        try:
+            if start:
+                grid_out.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = await grid_out.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            grid_out.close()
+
+    async def size(self, key: str) -> int:
+        file = await self.files.find_one({"_id": key}, {"length": 1})
+        if file is None:
+            raise FileNotFoundError(key)
+        return file["length"]
+
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        files = await self.files.find({"_id": {"$in": list(keys)}}, {"length": 1}).to_list(length=None)
+        if not files:
+            return 0
+        ids = [file["_id"] for file in files]
+        # One round trip per collection instead of GridFSBucket.delete per file
+        await self.files.delete_many({"_id": {"$in": ids}})
+        await self.chunks.delete_many({"files_id": {"$in": ids}})
+        return sum(file["length"] for file in files)
+
+    async def presigned_url(self, key: str, filename: str) -> Optional[str]:
+        # GridFS files are streamed by the API
+        return None
+
+
+_backends: Dict[str, object] = {}
+_database = None
+
+
+def init_storage(db) -> None:
+    """Binds database-backed storage (GridFS) to this worker's database."""
+    global _database
+    _database = db
+    _backends.pop("gridfs", None)
+
+
+def get_storage(name: Optional[str] = None):
+    """Returns the named storage backend (the configured default when no name is given)."""
+    name = name or settings.STORAGE_BACKEND
+    if name not in _backends:
+        if name == "local":
+            _backends[name] = LocalStorage(settings.LOCAL_STORAGE_DIR)
+        elif name == "s3":
+            if not settings.S3_BUCKET:
+                raise RuntimeError("The s3 storage backend requires S3_BUCKET")
+            _backends[name] = S3Storage(settings.S3_BUCKET)
+        elif name == "gridfs":
+            if _database is None:
+                raise RuntimeError("The gridfs storage backend is not initialised (see init_storage)")
+            _backends[name] = GridFSStorage(_database, settings.GRIDFS_BUCKET)
+        else:
+            raise ValueError(f"Unknown storage backend: {name}")
+    return _backends[name]
+
+
+def material_location(material: dict):
+    """Returns (backend, key) for a material row, including rows written before storage backends existed."""
+    if material.get("storage_key"):
+        return get_storage(material.get("storage_backend", "local")), material["storage_key"]
+    local = get_storage("local")
+    return local, os.path.relpath(material["file_url"], local.root)
@@ -0,0 +1,89 @@
+"""
+Plain-text extraction from uploaded documents, run in a process pool by utils/material_search.py.
+
+Every extractor streams its input and stops once `max_chars` characters have been collected,
+so memory per document stays bounded regardless of the file size.
+"""
+import os
+import re
+import zipfile
+from typing import Iterator, Optional
+from xml.etree.ElementTree import iterparse
+
+# Text-run elements in the Office Open XML formats
+WORD_TEXT = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t"
+WORD_PARAGRAPH = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p"
+DRAWING_TEXT = "{http://schemas.openxmlformats.org/drawingml/2006/main}t"
+DRAWING_PARAGRAPH = "{http://schemas.openxmlformats.org/drawingml/2006/main}p"
+
+PLAIN_TEXT_TYPES = ("text/",)
+PLAIN_TEXT_EXTENSIONS = {".txt", ".md", ".csv", ".tex", ".py", ".html"}
+
+
+def document_kind(filename: str, content_type: Optional[str]) -> Optional[str]:
+    """Returns "pdf", "docx", "pptx" or "text" for extractable files, None for everything else."""
+    ext = os.path.splitext(filename)[1].lower()
+    content_type = content_type or ""
+    if ext == ".pdf" or content_type == "application/pdf":
+        return "pdf"
+    if ext == ".docx" or content_type.endswith("wordprocessingml.document"):
+        return "docx"
+    if ext == ".pptx" or content_type.endswith("presentationml.presentation"):
+        return "pptx"
+    if ext in PLAIN_TEXT_EXTENSIONS or content_type.startswith(PLAIN_TEXT_TYPES):
+        return "text"
+    return None
+
+
+def _xml_text(archive: zipfile.ZipFile, member: str, text_tag: str, paragraph_tag: str) -> Iterator[str]:
+    # iterparse keeps only the open elements; finished ones are cleared as we go
+    with archive.open(member) as stream:
+        for _, element in iterparse(stream, events=("end",)):
+            if element.tag == text_tag and element.text:
+                yield element.text
+            elif element.tag == paragraph_tag:
+                yield "\n"
+                element.clear()
+
+
+def _docx(path: str) -> Iterator[str]:
+    with zipfile.ZipFile(path) as archive:
+        yield from _xml_text(archive, "word/document.xml", WORD_TEXT, WORD_PARAGRAPH)
+
+
+def _pptx(path: str) -> Iterator[str]:
+    with zipfile.ZipFile(path) as archive:
+        slides = [name for name in archive.namelist() if re.fullmatch(r"ppt/slides/slide\d+\.xml", name)]
+        for slide in sorted(slides, key=lambda name: int(re.search(r"\d+", name).group())):
+            yield from _xml_text(archive, slide, DRAWING_TEXT, DRAWING_PARAGRAPH)
+            yield "\n"
+
+
+def _pdf(path: str) -> Iterator[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        # PDF text is optional; without pypdf the material is indexed by title and description only
+        return
+    for page in PdfReader(path).pages:
+        yield (page.extract_text() or "") + "\n"
+
+
+def _text(path: str) -> Iterator[str]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while chunk := f.read(64 * 1024):
+            yield chunk
+
+
+EXTRACTORS = {"pdf": _pdf, "docx": _docx, "pptx": _pptx, "text": _text}
+
+
+def extract_text(path: str, kind: str, max_chars: int) -> str:
+    """Extracts at most `max_chars` characters of whitespace-normalized text from the file at `path`."""
+    parts, total = [], 0
+    for piece in EXTRACTORS[kind](path):
+        parts.append(piece)
+        total += len(piece)
+        if total >= max_chars:
+            break
+    return re.sub(r"\s+", " ", "".join(parts))[:max_chars].strip()
@@ -0,0 +1,144 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+from bson import Binary
+from config import settings
+from utils.scheduler import acquire_leader_lock
+from utils.storage import get_storage
+
+# Resumable upload sessions and their staged chunks. Chunks are staged in Mongo rather than on
+# local disk so every PATCH of a session can be served by any worker on any node.
+SESSIONS = "upload_sessions"
+CHUNKS = "upload_chunks"
+
+
+class OffsetMismatch(Exception):
+    """The client's Upload-Offset does not match the bytes received so far."""
+
+
+class SessionBusy(Exception):
+    """Another request is currently writing to the session."""
+
+
+class LengthExceeded(Exception):
+    """The client sent more bytes than the Upload-Length it declared."""
+
+
+def session_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+
+
+async def _acquire_writer(db, session_id, offset: int) -> Optional[str]:
+    """Takes the session's write lease when `offset` is the current offset; returns the lease token."""
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    session = await db[SESSIONS].find_one_and_update(
+        {
+            "_id": session_id,
+            "status": "open",
+            "offset": offset,
+            "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+        },
+        {"$set": {"lease": token, "lease_until": now + timedelta(seconds=settings.UPLOAD_LEASE_SECONDS)}},
+    )
+    return token if session else None
+
+
+async def append_chunks(db, session: dict, offset: int, body: AsyncIterator[bytes]) -> int:
+    """
+    Appends a PATCH body to the session's staged chunks, starting at `offset`; returns the new offset.
+
+    The body is staged in pieces of UPLOAD_STAGING_CHUNK_SIZE and the session offset advances
+    after each piece, so a request cut off half way still keeps what arrived. A write lease
+    keeps concurrent requests for the same session out.
+    """
+    if offset != session["offset"]:
+        raise OffsetMismatch()
+    token = await _acquire_writer(db, session["_id"], offset)
+    if token is None:
+        current = await db[SESSIONS].find_one({"_id": session["_id"]}, {"offset": 1})
+        if current and current["offset"] != offset:
+            raise OffsetMismatch()
+        raise SessionBusy()
+
+    # Pieces left past the offset by a request that died before advancing it
+    await db[CHUNKS].delete_many({"session_id": session["_id"], "offset": {"$gte": offset}})
+
+    buffer = bytearray()
+
+    async def flush():
+        nonlocal offset
+        await db[CHUNKS].insert_one({"session_id": session["_id"], "offset": offset, "data": Binary(bytes(buffer))})
+        result = await db[SESSIONS].update_one(
+            {"_id": session["_id"], "lease": token, "offset": offset},
+            {"$set": {
+                "offset": offset + len(buffer),
+                "expires_at": session_expiry(),
+                "lease_until": datetime.utcnow() + timedelta(seconds=settings.UPLOAD_LEASE_SECONDS),
+            }},
+        )
+        if result.modified_count == 0:
+            # The lease expired and another request took over
+            raise SessionBusy()
+        offset += len(buffer)
+        buffer.clear()
+
+    try:
+        async for data in body:
+            if offset + len(buffer) + len(data) > session["length"]:
+                raise LengthExceeded()
+            buffer.extend(data)
+            while len(buffer) >= settings.UPLOAD_STAGING_CHUNK_SIZE:
+                rest = bytes(buffer[settings.UPLOAD_STAGING_CHUNK_SIZE:])
+                del buffer[settings.UPLOAD_STAGING_CHUNK_SIZE:]
+                await flush()
+                buffer.extend(rest)
+        if buffer:
+            await flush()
+    finally:
+        await db[SESSIONS].update_one(
+            {"_id": session["_id"], "lease": token}, {"$set": {"lease": None, "lease_until": None}}
+        )
+    return offset
+
+
+async def iter_staged(db, session_id) -> AsyncIterator[bytes]:
+    """Yields the staged chunks in order, checking they are contiguous."""
+    expected = 0
+    async for chunk in db[CHUNKS].find({"session_id": session_id}).sort("offset", 1):
+        if chunk["offset"] != expected:
+            raise ValueError(f"Staged upload has a gap at byte {expected}")
+        expected += len(chunk["data"])
+        yield bytes(chunk["data"])
+
+
+async def discard_session(db, session_id) -> None:
+    await db[CHUNKS].delete_many({"session_id": session_id})
+    await db[SESSIONS].delete_one({"_id": session_id})
+
+
+async def collect_abandoned_uploads(db) -> int:
+    """Deletes sessions (and their staged chunks) idle past UPLOAD_SESSION_TTL; returns how many."""
+    expired = await db[SESSIONS].find(
+        {"expires_at": {"$lt": datetime.utcnow()}}, {"status": 1, "storage_backend": 1, "storage_key": 1}
+    ).to_list(length=None)
+    for session in expired:
+        # A finalization that died after storing the file but before creating the material row
+        if session["status"] == "completing" and not await db["materials"].find_one({"_id": session["_id"]}, {"_id": 1}):
+            await get_storage(session["storage_backend"]).delete_many([session["storage_key"]])
+        await discard_session(db, session["_id"])
+    return len(expired)
+
+
+async def run_upload_gc(db) -> None:
+    """Collects abandoned uploads every UPLOAD_GC_INTERVAL seconds on whichever worker holds the lock."""
+    while True:
+        try:
+            if await acquire_leader_lock(db, "upload_gc", settings.UPLOAD_GC_INTERVAL * 2):
+                collected = await collect_abandoned_uploads(db)
+                if collected:
+                    print(f"Collected {collected} abandoned uploads")
+        except Exception as e:
+            print(f"Upload garbage collection failed: {e}")
+        await asyncio.sleep(settings.UPLOAD_GC_INTERVAL)
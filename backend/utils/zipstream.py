@@ -0,0 +1,80 @@
+import asyncio
+import os
+import zipfile
+from datetime import datetime
+from typing import AsyncIterator, Iterable, NamedTuple, Optional
+
+# Formats that are already compressed; deflating them again costs CPU for no gain
+STORED_TYPES = ("video/", "audio/", "image/jpeg", "image/png", "image/gif", "image/webp", "application/pdf",
+                "application/zip", "application/gzip", "application/x-7z-compressed", "application/vnd.rar",
+                "application/vnd.openxmlformats-officedocument.")
+STORED_EXTENSIONS = {".mp4", ".mkv", ".mov", ".webm", ".mp3", ".m4a", ".ogg", ".jpg", ".jpeg", ".png", ".gif",
+                     ".webp", ".pdf", ".zip", ".gz", ".7z", ".rar", ".docx", ".pptx", ".xlsx"}
+
+
+class ZipEntry(NamedTuple):
+    name: str
+    size: int
+    content_type: Optional[str]
+    modified: datetime
+    chunks: AsyncIterator[bytes]
+
+
+class _Sink:
+    """Write-only, unseekable file object; zipfile then streams entries with data descriptors."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.buffer.extend(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def compress_type(name: str, content_type: Optional[str]) -> int:
+    if (content_type or "").startswith(STORED_TYPES) or os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+async def stream_zip(entries: Iterable[ZipEntry]) -> AsyncIterator[bytes]:
+    """
+    Yields a ZIP archive of `entries` as it is written, without a temp file or the whole archive in memory.
+
+    Each entry's bytes are pulled from its async iterator and written straight through; at most
+    one chunk (plus its compressed output) is buffered. Already-compressed formats are stored,
+    the rest deflated in a worker thread. Sizes past 4 GiB switch to ZIP64 automatically.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w") as archive:
+        for entry in entries:
+            info = zipfile.ZipInfo(entry.name, date_time=max(entry.modified, datetime(1980, 1, 1)).timetuple()[:6])
+            info.compress_type = compress_type(entry.name, entry.content_type)
+            info.file_size = entry.size  # Lets zipfile decide on ZIP64 for the entry up front
+            deflate = info.compress_type == zipfile.ZIP_DEFLATED
+            with archive.open(info, "w") as dest:
+                async for chunk in entry.chunks:
+                    if deflate:
+                        await asyncio.to_thread(dest.write, chunk)
+                    else:
+                        dest.write(chunk)
+                    if sink.buffer:
+                        yield sink.drain()
+            # The local header (for empty entries) and the data descriptor
+            if sink.buffer:
+                yield sink.drain()
+    # Central directory
+    yield sink.drain()